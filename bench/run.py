@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2024 Laserlicht
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+# Benchmark of extract_assets and create_mod on a synthetic game folder (see synth.py).
+# Every stage runs in its own process to measure its peak RSS. The report lists time,
+# entries/s and MB/s (uncompressed pak data) per stage and is compared to a stored baseline,
+# a stage more than --tolerance slower or bigger than the baseline fails the run. The baseline
+# is machine specific and not committed, --update creates it (bench/baseline.json).
+#
+# usage: run.py [--defs N] [--frames N] [--workers N] [--baseline FILE] [--update] [--report FILE]
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import resource
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+def __extract(game, work, workers):
+    from extract import extract_assets
+    extract_assets(game, os.path.join(work, "tmp"), workers=workers, cache=False)
+
+def __create_mod(scale, stream):
+    def run(game, work, workers):
+        from create_mod import create_mod
+        if stream:
+            create_mod(game, os.path.join(work, "stream"), [scale], stream=True)
+        else:
+            create_mod(os.path.join(work, "tmp"), os.path.join(work, "out"), [scale])
+    return run
+
+# stage name -> (scales of the paks read by the stage, function of (game folder, work folder, workers))
+STAGES = {
+    "extract": (["2", "3"], __extract),
+    "create_mod_x2": (["2"], __create_mod("2", False)),
+    "create_mod_x3": (["3"], __create_mod("3", False)),
+    "stream_x2": (["2"], __create_mod("2", True)),
+    "stream_x3": (["3"], __create_mod("3", True)),
+}
+
+def run_stage(name, game, work, workers):
+    # runs in the child process, returns the measurements of a stage
+    from pak import PakArchive, find_paks
+    scales, run = STAGES[name]
+    entries, size = 0, 0
+    for file, lang in find_paks(os.path.join(game, "data")):
+        if any("x" + x in os.path.basename(file) for x in scales):
+            with PakArchive(file) as pak:
+                entries += len(pak)
+                size += sum(pak.sizes)
+
+    start = time.perf_counter()
+    run(game, work, workers)
+    seconds = time.perf_counter() - start
+    return {
+        "seconds": round(seconds, 3),
+        "entries_per_second": round(entries / seconds, 1),
+        "mb_per_second": round(size / seconds / 1e6, 2),
+        "peak_rss_mb": round(peak_rss() / 1024, 1),
+    }
+
+def peak_rss():
+    # peak resident set size of this process in KiB. ru_maxrss is carried over from the parent
+    # process on Linux, VmHWM starts new with the exec of the stage.
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def run_benchmark(defs, frames, workers, seed=1):
+    from synth import write_game
+    work = tempfile.mkdtemp(prefix="vcmi_hd_bench_")
+    try:
+        game = os.path.join(work, "game")
+        write_game(game, defs, frames, seed)
+        stages = {}
+        for name in STAGES:
+            # stages run in order, create_mod reads the extract output
+            out = subprocess.run([sys.executable, os.path.abspath(__file__), "--stage", name, game, work, "--workers", str(workers)],
+                                 check=True, stdout=subprocess.PIPE, text=True).stdout
+            stages[name] = json.loads(out.splitlines()[-1])
+            print("%-14s %8.3f s %10.1f entries/s %8.2f MB/s %8.1f MB rss" % (name, stages[name]["seconds"], stages[name]["entries_per_second"],
+                                                                           stages[name]["mb_per_second"], stages[name]["peak_rss_mb"]), file=sys.stderr)
+        return {"defs": defs, "frames": frames, "workers": workers, "seed": seed, "stages": stages}
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+def compare(report, baseline, tolerance):
+    # list of regressions against the baseline
+    regressions = []
+    for name, stage in report["stages"].items():
+        if name not in baseline["stages"]:
+            continue
+        for key in ["seconds", "peak_rss_mb"]:
+            if stage[key] > baseline["stages"][name][key] * (1 + tolerance):
+                regressions.append("%s %s: %s, baseline %s" % (name, key, stage[key], baseline["stages"][name][key]))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark extract_assets and create_mod on synthetic paks")
+    parser.add_argument("--defs", type=int, default=20)
+    parser.add_argument("--frames", type=int, default=6)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown, 0.25 = 25%%")
+    parser.add_argument("--update", action="store_true", help="store the result as new baseline")
+    parser.add_argument("--report", help="write the result to this json file")
+    parser.add_argument("--stage", nargs=3, metavar=("NAME", "GAME", "WORK"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.stage:
+        print(json.dumps(run_stage(*args.stage, args.workers)))
+        return 0
+
+    report = run_benchmark(args.defs, args.frames, args.workers)
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=4)
+    if args.update:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=4)
+        return 0
+    if not os.path.isfile(args.baseline):
+        print("no baseline, run with --update to create one", file=sys.stderr)
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if any(report[x] != baseline.get(x) for x in ["defs", "frames", "workers", "seed"]):
+        print("baseline was taken with other settings, not compared", file=sys.stderr)
+        return 0
+    regressions = compare(report, baseline, args.tolerance)
+    for x in regressions:
+        print("REGRESSION " + x, file=sys.stderr)
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2024 Laserlicht
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+# Synthetic game folder for benchmarks, in the layout read by extract_assets and PakSource:
+#   data/sprite_DXT_com_x<scale>.pak, data/bitmap_DXT_com_x<scale>.pak
+#   data/LOC/EN/sprite_DXT_loc_x<scale>.pak, data/LOC/EN/bitmap_DXT_loc_x<scale>.pak (raw chunks)
+#   data/spriteFlagsInfo.txt, data/flags/flag_grey.png, data/flags/flag_grey_x2.png
+# Def and frame names and sizes are taken from sd_lod_sprites.csv, so the sprite index finds them.
+# Every atlas is a DXT5 dds image in its own (zlib compressed) chunk.
+#
+# usage: synth.py <game folder> [--defs N] [--frames N] [--seed N]
+
+import os
+import sys
+import csv
+import zlib
+import struct
+import argparse
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from plan import CREATURES, SKIPPED_DEFS
+
+ATLAS_SIZE = 2048
+MAX_FRAME_SIZE = 200 # sd pixels, bigger frames are left out so x3 frames fit the atlas
+
+def write_game(game_folder, defs=20, frames=6, seed=1):
+    rng = np.random.default_rng(seed)
+    data = os.path.join(game_folder, "data")
+    os.makedirs(os.path.join(data, "LOC", "EN"), exist_ok=True)
+    os.makedirs(os.path.join(data, "flags"), exist_ok=True)
+
+    sprites = pick_defs(defs, frames)
+    loc_sprites = dict(list(sprites.items())[:max(1, defs // 10)])
+    for scale in [2, 3]:
+        write_pak(os.path.join(data, "sprite_DXT_com_x%d.pak" % scale),
+                  [(x, *build_entry(rng, y, scale)) for x, y in sprites.items()])
+        write_pak(os.path.join(data, "LOC", "EN", "sprite_DXT_loc_x%d.pak" % scale),
+                  [(x, *build_entry(rng, y, scale)) for x, y in loc_sprites.items()])
+        bitmaps = [("Bitmap%02d" % i, int(rng.integers(16, 120)), int(rng.integers(16, 120))) for i in range(frames)]
+        write_pak(os.path.join(data, "bitmap_DXT_com_x%d.pak" % scale),
+                  [("bitmaps", *build_entry(rng, bitmaps, scale, shadow=False))])
+        write_pak(os.path.join(data, "LOC", "EN", "bitmap_DXT_loc_x%d.pak" % scale),
+                  [("locbmps", *build_entry(rng, bitmaps[:2], scale, shadow=False))], compress=False, raw_chunk=1 << 18 if scale == 3 else None)
+
+    # flags on the first frame of every non creature def
+    with open(os.path.join(data, "spriteFlagsInfo.txt"), "w") as f:
+        for defname, items in sprites.items():
+            if not defname.upper().startswith(CREATURES):
+                f.write("%s 2 2 2 0 %d 3 1\n" % (items[0][0], items[0][1] // 2))
+    Image.new("RGBA", (8, 6), (200, 50, 50, 255)).save(os.path.join(data, "flags", "flag_grey.png"))
+    Image.new("RGBA", (5, 4), (200, 50, 50, 200)).save(os.path.join(data, "flags", "flag_grey_x2.png"))
+
+def pick_defs(defs, frames):
+    # defname -> [(imagename, width, height)], half creatures (outlines), half other defs
+    rows = {}
+    with open(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sd_lod_sprites.csv")) as f:
+        for row in csv.DictReader(f, delimiter=";"):
+            rows.setdefault(row["defname"], []).append(row)
+    candidates = [x for x, y in rows.items() if x.upper() not in SKIPPED_DEFS and
+                  max(int(r["width"]) for r in y) <= MAX_FRAME_SIZE and max(int(r["height"]) for r in y) <= MAX_FRAME_SIZE]
+    creatures = [x for x in candidates if x.upper().startswith(CREATURES)]
+    others = [x for x in candidates if not x.upper().startswith(CREATURES)]
+    picked = creatures[:defs // 2] + others[:defs - min(len(creatures), defs // 2)]
+    return {x: [(r["imagename"], int(r["width"]), int(r["height"])) for r in rows[x][:frames]] for x in picked}
+
+def build_entry(rng, items, scale, shadow=True):
+    # config text and dds images of an entry, items: [(imagename, sd width, sd height)]
+    atlases = [np.zeros((ATLAS_SIZE, ATLAS_SIZE, 4), np.uint8)]
+    shelf = [0, 0, 0] # x, y, height of the current row
+    def place(width, height):
+        if shelf[0] + width > ATLAS_SIZE:
+            shelf[:] = [0, shelf[1] + shelf[2], 0]
+        if shelf[1] + height > ATLAS_SIZE:
+            atlases.append(np.zeros((ATLAS_SIZE, ATLAS_SIZE, 4), np.uint8))
+            shelf[:] = [0, 0, 0]
+        pos = (len(atlases) - 1, shelf[0], shelf[1])
+        shelf[0] += width
+        shelf[2] = max(shelf[2], height)
+        return pos
+
+    lines = []
+    for name, width, height in items:
+        width, height = width * scale, height * scale
+        rotation = int(rng.integers(0, 2))
+        atlas_width, atlas_height = (height, width) if rotation else (width, height)
+        atlas, x, y = place(atlas_width, atlas_height)
+        img = sprite(rng, width, height)
+        atlases[atlas][y:y + atlas_height, x:x + atlas_width] = np.rot90(img, 1) if rotation else img
+        line = [name, atlas, int(rng.integers(-2, 3)), 0, int(rng.integers(-2, 3)), 0, x, y, atlas_width, atlas_height, rotation, int(shadow)]
+        if shadow:
+            atlas, x, y = place(width, height // 2)
+            atlases[atlas][y:y + height // 2, x:x + width, 3] = 128
+            line += [atlas, x, y, width, height // 2, 0]
+        lines.append(" ".join(str(x) for x in line))
+    # the last atlas is cut to the used rows
+    atlases[-1] = atlases[-1][:max(4, (shelf[1] + shelf[2] + 3) // 4 * 4)]
+    return ("\r\n".join(lines) + "\r\n").encode(), [dds(x) for x in atlases]
+
+def sprite(rng, width, height):
+    # opaque ellipse with a gradient on a transparent background
+    img = np.zeros((height, width, 4), np.uint8)
+    yy, xx = np.mgrid[0:height, 0:width]
+    img[..., 0] = (xx * 7) % 256
+    img[..., 1:3] = rng.integers(0, 256, 2)
+    img[..., 3] = np.where(((xx - width / 2) / (width / 2)) ** 2 + ((yy - height / 2) / (height / 2)) ** 2 < 0.8, 255, 0)
+    return img
+
+def write_pak(file, entries, compress=True, raw_chunk=None):
+    # entries: [(name, config, [dds images])], every image is one chunk. Uncompressed images are
+    # split into chunks of raw_chunk bytes if given.
+    body = bytearray(8)
+    records = []
+    for name, config, images in entries:
+        offset = len(body)
+        body += config
+        zsizes, sizes = [], []
+        for image in images:
+            if compress:
+                chunks = [zlib.compress(image)]
+            else:
+                step = raw_chunk or len(image)
+                chunks = [image[x:x + step] for x in range(0, len(image), step)]
+            for chunk in chunks:
+                body += chunk
+                zsizes.append(len(chunk))
+                sizes.append(len(image) if compress else len(chunk))
+        records.append((name, offset, len(config), zsizes, sizes))
+    struct.pack_into("<I", body, 4, len(body))
+    body += struct.pack("<I", len(records))
+    for name, offset, config_size, zsizes, sizes in records:
+        body += name.encode()[:8].ljust(8, b"\0") + bytes(12)
+        body += struct.pack("<5I", offset, config_size, len(zsizes), sum(zsizes), sum(sizes))
+        body += struct.pack("<%dI" % len(zsizes), *zsizes) + struct.pack("<%dI" % len(sizes), *sizes)
+    with open(file, "wb") as f:
+        f.write(body)
+
+def dds(rgba):
+    height, width = rgba.shape[:2]
+    header = bytearray(128)
+    header[0:4] = b"DDS "
+    struct.pack_into("<7I", header, 4, 124, 0x81007, height, width, (width // 4) * (height // 4) * 16, 0, 1)
+    struct.pack_into("<2I4s", header, 76, 32, 4, b"DXT5")
+    struct.pack_into("<I", header, 108, 0x1000)
+    return bytes(header) + encode_dxt5(rgba)
+
+def encode_dxt5(rgba):
+    # simple DXT5 encoder: color endpoints are the brightest and darkest pixel of a block.
+    # Blocks that are all zero encode to zero bytes and are skipped.
+    height, width = rgba.shape[:2]
+    blocks = rgba.reshape(height // 4, 4, width // 4, 4, 4).transpose(0, 2, 1, 3, 4).reshape(-1, 16, 4)
+    used = blocks.reshape(len(blocks), -1).any(1)
+    ret = np.zeros((len(blocks), 16), np.uint8)
+    blocks = blocks[used].astype(np.int32)
+    count = len(blocks)
+
+    alpha = blocks[..., 3]
+    a0, a1 = alpha.max(1), alpha.min(1)
+    weights = np.array([7, 0, 6, 5, 4, 3, 2, 1])
+    palette = (weights[None] * a0[:, None] + (7 - weights)[None] * a1[:, None]) // 7
+    alpha_index = np.abs(palette[:, None, :] - alpha[:, :, None]).argmin(2).astype(np.uint64)
+    alpha_index[a0 == a1] = 0
+    alpha_bits = (alpha_index << (3 * np.arange(16, dtype=np.uint64))[None]).sum(1, dtype=np.uint64)
+
+    luma = blocks[..., :3].sum(2)
+    c0 = __rgb565(blocks[np.arange(count), luma.argmax(1), :3])
+    c1 = __rgb565(blocks[np.arange(count), luma.argmin(1), :3])
+    c0, c1 = np.maximum(c0, c1), np.minimum(c0, c1)
+    p0, p1 = __expand565(c0), __expand565(c1)
+    palette = np.stack([p0, p1, (2 * p0 + p1) // 3, (p0 + 2 * p1) // 3], 1)
+    color_index = ((palette[:, None, :, :] - blocks[:, :, None, :3]) ** 2).sum(3).argmin(2).astype(np.uint64)
+    color_index[c0 == c1] = 0
+    color_bits = (color_index << (2 * np.arange(16, dtype=np.uint64))[None]).sum(1, dtype=np.uint64)
+
+    out = np.zeros((count, 16), np.uint8)
+    out[:, 0], out[:, 1] = a0, a1
+    out[:, 2:8] = alpha_bits.astype("<u8").view(np.uint8).reshape(count, 8)[:, :6]
+    out[:, 8:10] = c0.astype("<u2").view(np.uint8).reshape(count, 2)
+    out[:, 10:12] = c1.astype("<u2").view(np.uint8).reshape(count, 2)
+    out[:, 12:16] = color_bits.astype("<u4").view(np.uint8).reshape(count, 4)
+    ret[used] = out
+    return ret.tobytes()
+
+def __rgb565(c):
+    return ((c[:, 0] >> 3) << 11) | ((c[:, 1] >> 2) << 5) | (c[:, 2] >> 3)
+
+def __expand565(c):
+    r, g, b = (c >> 11) & 31, (c >> 5) & 63, c & 31
+    return np.stack([(r << 3) | (r >> 2), (g << 2) | (g >> 4), (b << 3) | (b >> 2)], -1)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a synthetic game folder for benchmarks")
+    parser.add_argument("game_folder")
+    parser.add_argument("--defs", type=int, default=20)
+    parser.add_argument("--frames", type=int, default=6)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    write_game(args.game_folder, args.defs, args.frames, args.seed)
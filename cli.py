@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2024 Laserlicht
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+# Headless command line entry point. Only argparse and the pak directory reader are imported
+# up front, image and mod modules are imported by the commands that need them.
+#
+#   cli.py paks <game folder>                       pak files, languages and entry counts
+#   cli.py extract <game folder> <temp folder>      extract_assets
+#   cli.py build <temp or game folder> <output>     create_mod (--stream reads the game folder)
+#   cli.py all <game folder> <output> [--temp DIR]  both, like the gui (streamed without --temp)
+#
+# Runs from any working directory, sd_lod_sprites.csv is read from the folder of the scripts.
+
+import os
+import sys
+import time
+import signal
+import argparse
+import threading
+
+def main(argv=None):
+    args = __parser().parse_args(argv)
+    if args.dry_run:
+        return __dry_run(args)
+
+    from progress import Cancelled
+    from instrument import Stats, peak_rss
+    args.cancel = threading.Event()
+    args.stats = Stats(profile=args.profile) if args.stats_file else None
+    signal.signal(signal.SIGINT, lambda *x: __interrupt(args.cancel))
+    try:
+        code = args.run(args)
+        rss = peak_rss()
+        if not args.quiet and args.command in ("extract", "build", "all") and rss is not None:
+            print("peak memory: %d MB" % (rss >> 20), file=sys.stderr)
+    except Cancelled:
+        print("cancelled, outputs left as before", file=sys.stderr)
+        return 130
+    finally:
+        if args.stats is not None:
+            args.stats.write(args.stats_file)
+    return code or 0
+
+def __parser():
+    parser = argparse.ArgumentParser(description="Extract Heroes HD assets and build VCMI mods without the gui")
+    parser.set_defaults(dry_run=False, quiet=False, stats_file=None, profile=0, langs=None)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    paks = commands.add_parser("paks", help="list the pak files of a game folder")
+    paks.add_argument("game_folder")
+    paks.add_argument("--langs", nargs="+", default=None, metavar="LANG", help="languages (data/LOC folders) to include, default all")
+    paks.set_defaults(run=__paks)
+
+    extract = commands.add_parser("extract", help="extract the paks of a game folder into a temporary folder")
+    extract.add_argument("game_folder")
+    extract.add_argument("temp_folder")
+    __extract_options(extract)
+    __common_options(extract)
+    extract.set_defaults(run=__extract)
+
+    build = commands.add_parser("build", help="build the mods from a temporary folder (or a game folder with --stream)")
+    build.add_argument("input_folder")
+    build.add_argument("output_folder")
+    build.add_argument("--stream", action="store_true", help="read the game folder paks directly")
+    __build_options(build)
+    __common_options(build)
+    build.set_defaults(run=__build)
+
+    both = commands.add_parser("all", help="extract and build, streamed from the game folder without --temp")
+    both.add_argument("game_folder")
+    both.add_argument("output_folder")
+    both.add_argument("--temp", dest="temp_folder", help="temporary folder for the extracted images")
+    __extract_options(both)
+    __build_options(both)
+    __common_options(both)
+    both.set_defaults(run=__all)
+
+    verify = commands.add_parser("verify", help="check built mods against the game paks without rebuilding them")
+    verify.add_argument("game_folder")
+    verify.add_argument("output_folder")
+    verify.add_argument("--scales", nargs="+", default=["2", "3"], choices=["2", "3"])
+    verify.add_argument("--langs", nargs="+", default=None, metavar="LANG", help="languages (data/LOC folders) to include, default all")
+    verify.set_defaults(run=__verify)
+    return parser
+
+def __extract_options(parser):
+    parser.add_argument("--workers", type=int, default=1, help="extraction processes")
+    parser.add_argument("--inflate-threads", type=int, default=1, help="threads inflating the chunks of an entry")
+    parser.add_argument("--save-dds", action="store_true", help="also write the dds atlases")
+    parser.add_argument("--no-cache", dest="cache", action="store_false", help="extract unchanged entries again")
+    parser.add_argument("--pack", action="store_true", help="write the images into one pack file instead of loose files")
+
+def __build_options(parser):
+    parser.add_argument("--scales", nargs="+", default=["2", "3"], choices=["2", "3"])
+    parser.add_argument("--threads", type=int, default=None, help="png encoding threads")
+    parser.add_argument("--png-level", type=int, default=6, choices=range(10), metavar="0-9")
+    parser.add_argument("--png-optimize", action="store_true")
+    parser.add_argument("--deflate", action="store_true", help="deflate content.zip members")
+    parser.add_argument("--dedup", action="store_true", help="write identical frames of a def once")
+    parser.add_argument("--trim", action="store_true", help="crop frames to their opaque bounds")
+    parser.add_argument("--full", dest="incremental", action="store_false", help="build unchanged bitmaps and defs again instead of copying them")
+
+def __common_options(parser):
+    parser.add_argument("--langs", nargs="+", default=None, metavar="LANG", help="languages (data/LOC folders) to include, default all")
+    parser.add_argument("--memory", type=int, default=None, metavar="MB", help="memory budget for images in flight, large defs are done in batches of frames")
+    parser.add_argument("--include", nargs="+", default=None, metavar="PATTERN", help="only these pak entries, defs or bitmaps (glob, <pak>/<name> for one pak)")
+    parser.add_argument("--exclude", nargs="+", default=None, metavar="PATTERN", help="skip these pak entries, defs or bitmaps")
+    parser.add_argument("--dry-run", action="store_true", help="only list what would be read")
+    parser.add_argument("--quiet", action="store_true", help="no progress output")
+    parser.add_argument("--stats", dest="stats_file", help="write a json report of stage timings and counters")
+    parser.add_argument("--profile", type=int, default=0, metavar="N", help="cProfile dumps of the N slowest items (with --stats)")
+
+def __interrupt(cancel):
+    # the first ctrl+c stops the run cleanly, the second one the process
+    print("\ncancelling...", file=sys.stderr)
+    cancel.set()
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+def __progress(args):
+    if args.quiet:
+        return None
+    last = [0.0]
+    def show(event):
+        now = time.monotonic()
+        if now - last[0] < 1 and event.done < event.total:
+            return
+        last[0] = now
+        eta = "" if event.eta is None else ", %d:%02d left" % (event.eta // 60, event.eta % 60)
+        print("%s: %d/%d, %.1f items/s%s" % (event.stage, event.done, event.total, event.rate, eta), file=sys.stderr)
+    return show
+
+def __extract_kwargs(args):
+    return {"save_dds": args.save_dds, "workers": args.workers, "cache": args.cache, "threads": args.inflate_threads, "langs": args.langs, "select": __selection(args), "pack": args.pack, "memory": args.memory,
+            "stats": args.stats, "progress": __progress(args), "cancel": args.cancel}
+
+def __build_kwargs(args):
+    import zipfile
+    return {"png_level": args.png_level, "png_optimize": args.png_optimize, "compression": zipfile.ZIP_DEFLATED if args.deflate else zipfile.ZIP_STORED,
+            "threads": args.threads, "dedup": args.dedup, "trim": args.trim, "langs": args.langs, "select": __selection(args), "incremental": args.incremental, "memory": args.memory, "stats": args.stats, "progress": __progress(args), "cancel": args.cancel}
+
+def __selection(args):
+    from selection import Selection
+    return Selection(args.include, args.exclude)
+
+def __paks(args):
+    from pak import PakArchive, find_paks
+    for file, lang in find_paks(os.path.join(args.game_folder, "data"), args.langs):
+        with PakArchive(file) as pak:
+            print("%-60s %-3s %6d entries %12d bytes" % (os.path.relpath(file, args.game_folder), lang or "-", len(pak), sum(pak.sizes)))
+
+def __extract(args):
+    from extract import extract_assets
+    extract_assets(args.game_folder, args.temp_folder, **__extract_kwargs(args))
+
+def __build(args):
+    from create_mod import create_mod
+    create_mod(args.input_folder, args.output_folder, args.scales, stream=args.stream, **__build_kwargs(args))
+
+def __all(args):
+    from create_mod import create_mod
+    if args.temp_folder:
+        from extract import extract_assets
+        extract_assets(args.game_folder, args.temp_folder, **__extract_kwargs(args))
+        create_mod(args.temp_folder, args.output_folder, args.scales, **__build_kwargs(args))
+    else:
+        create_mod(args.game_folder, args.output_folder, args.scales, stream=True, **__build_kwargs(args))
+
+def __verify(args):
+    # exit code 1 if a mod is missing, stale or has missing or extra members
+    from verify import verify_mod
+    problems = verify_mod(args.game_folder, args.output_folder, args.scales, args.langs)
+    for x in problems:
+        print("%-24s %-10s %s (%s)" % (x.mod, x.kind, x.name, x.detail))
+    print("%d problems" % len(problems), file=sys.stderr)
+    return 1 if len(problems) > 0 else 0
+
+def __dry_run(args):
+    # the paks and folders a command would read and write, nothing is written
+    game_folder = getattr(args, "game_folder", None) or (args.input_folder if args.stream else None)
+    if game_folder is not None:
+        __paks(argparse.Namespace(game_folder=game_folder, langs=args.langs))
+    else:
+        print("reads %s" % os.path.join(args.input_folder, "info.csv"))
+    for x in ["temp_folder", "output_folder"]:
+        if getattr(args, x, None):
+            print("writes %s" % getattr(args, x))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
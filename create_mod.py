@@ -23,22 +23,67 @@
 # SOFTWARE.
 
 import os
-import io
 import json
 import zipfile
-import pandas as pd
-from PIL import Image, ImageFilter, ImageEnhance
+import functools
+from PIL import Image, ImageEnhance
+from frame import Frame
+from source import FolderSource, PakSource
+from spriteindex import SPRITES_CSV, load_index
+from plan import plan_sprites
+from outline import outlines
+from zipwriter import ZipWriter
+from instrument import NO_STATS
+from progress import Progress
+from selection import ALL
+from fingerprints import bitmap_fingerprint, def_fingerprint, load_fingerprints, save_fingerprints
 
-def create_mod(in_folder, out_folder, scales):
+# RoE specific bitmaps
+SKIPPED_BITMAPS = ["MAINMENU", "GAMSELBK", "GSELPOP1", "SCSELBCK", "LOADGAME", "NEWGAME", "LOADBAR"]
+
+# stored with the build options, raise it when a change here changes the written members. Mods
+# built by an older version are then rebuilt completely instead of copying unchanged groups.
+BUILD_VERSION = 1
+
+def create_mod(in_folder, out_folder, scales, stream=False, png_level=6, png_optimize=False, compression=zipfile.ZIP_STORED, threads=None, dedup=False, trim=False, langs=None, select=None, incremental=True, memory=None, stats=None, progress=None, cancel=None):
+    # stream: read the images directly from the game folder paks instead of the extracted folder
+    # png_level, png_optimize: png compression of the written images, lower is faster but bigger
+    # compression: zipfile.ZIP_STORED or zipfile.ZIP_DEFLATED for content.zip
+    # threads: png encoding and compression threads, default depends on the cpu count
+    # dedup: write identical frames of a def once and point the animation config at the first one
+    # trim: crop frames to their opaque bounds instead of padding them to the def size, the position
+    #       on the def canvas is written to the animation config (engine support needed)
+    # langs: languages (data/LOC folder names) getting a translation mod, default all
+    # select: selection.Selection of the bitmaps and defs to build, the others are copied from the
+    #         previous content.zip files, which have to be built with the same options
+    # incremental: copy the bitmaps and defs whose pak entries, sprite index rows and flags did not
+    #              change since the previous build from its content.zip without encoding them.
+    #              Without it the pak entries are not hashed, the next incremental build builds
+    #              everything again.
+    # memory: budget in MB for the frames of a def and the queued archive members, defs that do
+    #         not fit are read and written in batches of frames
+    # stats: instrument.Stats collecting stage timings and counters
+    # progress: callback getting a progress.ProgressEvent per written bitmap and def
+    # cancel: threading.Event, raises progress.Cancelled when set. The content.zip files of the
+    #         previous run stay in place.
+    png = {"compress_level": png_level, "optimize": png_optimize}
+    archive = {"compression": compression, "threads": threads}
+    if memory is not None:
+        memory = memory << 20
+        archive["memory"] = memory // 2
+    with (PakSource(in_folder) if stream else FolderSource(in_folder)) as source:
+        __create_mod(source, out_folder, scales, png, archive, dedup, trim, langs, select or ALL, incremental, memory, stats or NO_STATS, Progress(progress, cancel))
+
+def __create_mod(source, out_folder, scales, png, archive_options, dedup, trim, langs, select, incremental, memory, stats, progress):
     out_folder = os.path.join(out_folder, "hd_version")
     os.makedirs(out_folder, exist_ok=True)
 
-    df = pd.read_csv("sd_lod_sprites.csv", sep=";", header=0) # export from H3 Complete
-    df_pak = pd.read_csv(os.path.join(in_folder, "info.csv"), sep=";", header=None, names=range(20))
-    df_flag = pd.read_csv(os.path.join(in_folder, "data", "spriteFlagsInfo.txt"), sep=" ", names=range(20), header=None)
+    # sd_lod_sprites.csv (export from H3 Complete), info.csv and spriteFlagsInfo.txt
+    with stats.stage("index"):
+        index = load_index(source.index_path, SPRITES_CSV, source.info(), os.path.join(source.data_path, "spriteFlagsInfo.txt"))
 
     # flag images
-    flag_path = os.path.join(in_folder, "data", "flags")
+    flag_path = os.path.join(source.data_path, "flags")
     flag_img_tmp = {
         2: Image.open(os.path.join(flag_path, "flag_grey_x2.png")),
         3: Image.open(os.path.join(flag_path, "flag_grey.png"))
@@ -49,116 +94,333 @@ def create_mod(in_folder, out_folder, scales):
     ]
     flag_img = [{x2:ImageEnhance.Brightness(y2).enhance(2.5) for x2, y2 in x.items()} for x in flag_img] #brighten flags
 
-    for scale in scales:
-        lang = os.listdir(os.path.join(in_folder, "bitmap_DXT_loc_x" + scale + ".pak"))[0]
-
-        out_folder_main = os.path.join(out_folder, "mods", "x" + scale)
-        os.makedirs(out_folder_main, exist_ok=True)
-        out_folder_translation = os.path.join(out_folder, "mods", "x" + scale + "_translation_" + lang.lower())
-        os.makedirs(out_folder_translation, exist_ok=True)
-
-        with open(os.path.join(out_folder, "mod.json"), "w") as f:
-            f.write(create_mod_config())
-        with open(os.path.join(out_folder_main, "mod.json"), "w") as f:
-            f.write(create_main_mod_config(scale))
-        with open(os.path.join(out_folder_translation, "mod.json"), "w") as f:
-            f.write(create_lang_mod_config(scale, lang))
-
-        for name, destination in { "bitmap_DXT_com_x" + scale + ".pak": out_folder_main, "bitmap_DXT_loc_x" + scale + ".pak": out_folder_translation }.items():
-            with zipfile.ZipFile(os.path.join(destination, "content.zip"), mode="w", compression=zipfile.ZIP_STORED) as archive:
-                path = os.path.join(in_folder, name, lang if "loc" in name else "")
-                for file in os.listdir(path):
-                    handle_bitmaps(archive, path, file, scale)
-
-        for name, destination in { "sprite_DXT_com_x" + scale + ".pak": out_folder_main, "sprite_DXT_loc_x" + scale + ".pak": out_folder_translation }.items():
-            with zipfile.ZipFile(os.path.join(destination, "content.zip"), mode="a", compression=zipfile.ZIP_STORED) as archive:
-                path = os.path.join(in_folder, name, lang if "loc" in name else "")
-
-                grouped_df = df.groupby('defname')
-                for name, group in grouped_df:
-                    folders = [x.upper() for x in os.listdir(path)]
-                    if name.upper() in folders:
-                        folder = os.listdir(path)[folders.index(name.upper())]
-                        handle_sprites(archive, path, folder, scale, group, df_pak[df_pak[1].str.upper() == folder.upper()], df_flag, flag_img)
-
-def handle_bitmaps(archive, path, file, scale):
+    with open(os.path.join(out_folder, "mod.json"), "w") as f:
+        f.write(create_mod_config())
+
+    # per scale a main mod from the com paks and a translation mod per language from the loc paks.
+    # All mods are planned up front for the progress total, defs with the same files are planned once.
+    options = {"build": BUILD_VERSION, **png, "compression": archive_options["compression"], "dedup": dedup, "trim": trim}
+    jobs = []
+    plans = {}
+    with stats.stage("plan"):
+        for scale in scales:
+            for mod, pak, lang in list_mods(source, scale, langs):
+                bitmaps, defs = source_groups(source, index, scale, pak, lang, plans)
+                bitmaps, defs, kept = __select(source, os.path.join(out_folder, "mods", mod), select, incremental, options, scale, pak, lang, bitmaps, defs)
+                if kept is not None:
+                    jobs.append((scale, mod, pak, lang, bitmaps, defs, kept))
+                    stats.count("groups_copied", len(kept))
+                    stats.count("groups_built", len(bitmaps) + len(defs))
+                else:
+                    stats.count("mods_unchanged")
+    progress.start("create_mod", sum(sum(len(y[2]) for y in x[4]) + len(x[5]) for x in jobs))
+
+    for scale, mod, pak, lang, bitmaps, defs, kept in jobs:
+        destination = os.path.join(out_folder, "mods", mod)
+        os.makedirs(destination, exist_ok=True)
+        with open(os.path.join(destination, "mod.json"), "w") as f:
+            f.write(create_lang_mod_config(scale, lang) if lang else create_main_mod_config(scale))
+
+        # bitmaps and sprites of a pak pair go into one content.zip
+        groups = dict(kept)
+        with ZipWriter(os.path.join(destination, "content.zip"), **archive_options) as archive:
+            if len(kept) > 0:
+                with stats.stage("copy"), zipfile.ZipFile(archive.file) as previous:
+                    for group in kept.values():
+                        for x in group["members"]:
+                            archive.copy(previous, x)
+            file_groups = {}
+            for name, fingerprint, files in bitmaps:
+                groups[name] = {"fingerprint": fingerprint, "inputs": __inputs(source, lang, name) if incremental else None, "members": []}
+                file_groups.update((x, name) for x in files)
+            for file, content in stats.iterate("read", source.bitmaps("bitmap_" + pak, lang, list(file_groups))):
+                member = handle_bitmaps(archive, file, content, scale, png, stats)
+                if member is not None:
+                    groups[file_groups[file]]["members"].append(member)
+                progress.advance()
+            for name, fingerprint, plan in defs:
+                with stats.item("def", mod + "/" + plan.folder):
+                    data = stats.timed("read", source.sprite_reader("sprite_" + pak, lang, plan.folder))
+                    members = handle_sprites(archive, data, plan, scale, flag_img, png, dedup, trim, stats, None if memory is None else memory // 2)
+                groups[name] = {"fingerprint": fingerprint, "inputs": __inputs(source, lang, name) if incremental else None, "members": members}
+                progress.advance()
+            # waits for the queued members and writes the zip directory
+            with stats.stage("archive_finish"):
+                archive.close()
+        save_fingerprints(destination, options, groups)
+        stats.count("archive_bytes", os.path.getsize(archive.file))
+
+def list_mods(source, scale, langs=None):
+    # (mod folder, pak name without prefix, language) of the mods of a scale
+    ret = [("x" + scale, "DXT_com_x" + scale + ".pak", "")]
+    ret += [("x" + scale + "_translation_" + lang.lower(), "DXT_loc_x" + scale + ".pak", lang) for lang in source.langs(scale) if langs is None or lang in langs]
+    return ret
+
+def source_groups(source, index, scale, pak, lang, plans):
+    # source groups of a mod with their fingerprint: (name, fingerprint, files) per bitmap pak entry
+    # and (name, fingerprint, plan) per def. Bitmaps without a known pak entry are a group of their own.
+    entries = source.entries("bitmap_" + pak, lang)
+    file_entries = {}
+    for entry, (fingerprint, files) in entries.items():
+        file_entries.update((x, entry) for x in files)
+    bitmaps = {}
+    for file in source.bitmap_files("bitmap_" + pak, lang):
+        if os.path.splitext(file)[0].upper() in SKIPPED_BITMAPS:
+            continue
+        entry = file_entries.get(file)
+        fingerprint = bitmap_fingerprint(entries[entry][0], scale) if entry is not None else None
+        bitmaps.setdefault("bitmap_" + pak + "/" + (entry or file), (fingerprint, []))[1].append(file)
+
+    entries = source.entries("sprite_" + pak, lang)
+    defs = []
+    for plan in plan_sprites(index, source, "sprite_" + pak, lang, plans):
+        source_fingerprint = entries.get(plan.folder, (None,))[0]
+        defs.append(("sprite_" + pak + "/" + plan.folder, def_fingerprint(source_fingerprint, scale, plan), plan))
+    return [(x, y[0], y[1]) for x, y in bitmaps.items()], defs
+
+def __inputs(source, lang, name):
+    # fingerprint of the stored chunks of the pak entry of a group, None for bitmaps without a known
+    # entry. A streamed build hashes the payload, so it is only asked for entries that are read
+    # anyway or whose other fingerprint is unchanged.
+    pak, entry = name.split("/", 1)
+    return source.content(pak, lang, entry)
+
+def __select(source, destination, select, incremental, options, scale, pak, lang, bitmaps, defs):
+    # bitmap and def groups to build and the groups to copy from the previous content.zip. With a
+    # selection the groups that are not selected are copied, otherwise (if incremental) the groups
+    # whose fingerprints are the same as in the fingerprints.json of the previous build. All groups
+    # are built without a previous archive or if the archive was built with other options. A group
+    # missing in the archive is built as well. Returns None as groups to copy if the archive would
+    # be written unchanged, it is left as it is then.
+    content = os.path.join(destination, "content.zip")
+    if not (select or incremental) or not os.path.isfile(content):
+        return bitmaps, defs, {}
+    previous = load_fingerprints(destination)
+    if previous is not None and previous[0] != options or previous is None and not select:
+        return bitmaps, defs, {}
+    previous = previous[1] if previous is not None else {}
+    with zipfile.ZipFile(content) as archive:
+        members = archive.namelist()
+    names = set(members)
+    folders = {}
+    for x in members:
+        folders.setdefault(x.rsplit("/", 1)[0], []).append(x)
+
+    def keep(name, fingerprint, selected, group):
+        if selected or not names.issuperset(group["members"]):
+            return False
+        if select:
+            return True
+        return fingerprint is not None and group["fingerprint"] == fingerprint and group.get("inputs") is not None and group["inputs"] == __inputs(source, lang, name)
+
+    kept = {}
+    build_bitmaps = []
+    for name, fingerprint, files in bitmaps:
+        group = previous.get(name, {"fingerprint": None, "members": ["data" + scale + "x/" + os.path.splitext(x)[0] + ".png" for x in files]})
+        if keep(name, fingerprint, select and any(select.match("bitmap_" + pak, frame_name(x)) for x in files), group):
+            kept[name] = group
+        else:
+            build_bitmaps.append((name, fingerprint, files))
+    build_defs = []
+    for name, fingerprint, plan in defs:
+        folder = "sprites" + scale + "x/" + plan.folder
+        group = previous.get(name, {"fingerprint": None, "members": folders.get(folder, []) + [folder + ".json"]})
+        if keep(name, fingerprint, select and select.match("sprite_" + pak, plan.folder), group):
+            kept[name] = group
+        else:
+            build_defs.append((name, fingerprint, plan))
+    # members of removed groups are dropped by writing the archive again
+    if len(build_bitmaps) == 0 and len(build_defs) == 0 and names.issubset(x for y in kept.values() for x in y["members"]):
+        return [], [], None
+    return build_bitmaps, build_defs, kept
+
+def handle_bitmaps(archive, file, content, scale, png=None, stats=NO_STATS):
     name = os.path.splitext(file)[0]
 
     # Skip RoE specific files
-    if name.upper() in [ "MAINMENU", "GAMSELBK", "GSELPOP1", "SCSELBCK", "LOADGAME", "NEWGAME", "LOADBAR" ]:
+    if name.upper() in SKIPPED_BITMAPS:
         return
 
-    archive.writestr("data" + scale + "x/" + os.path.splitext(file)[0] + ".png", open(os.path.join(path, file), "rb").read())
+    frame = Frame(content)
+    member = "data" + scale + "x/" + os.path.splitext(file)[0] + ".png"
+    archive.writestr(member, stats.timed("png_encode", functools.partial(frame.png, **(png or {}))), frame.memory())
+    stats.count("images_written")
+    return member
 
-def handle_sprites(archive, path, folder, scale, df, df_pak, df_flag, flag_img):
-    data = {x:open(os.path.join(path, folder, x), "rb").read() for x in os.listdir(os.path.join(path, folder))}
+def handle_sprites(archive, data, plan, scale, flag_img, png=None, dedup=False, trim=False, stats=NO_STATS, memory=None):
+    # data: file -> content of the def files, or a function returning it for a list of files
+    # memory: bytes of frames held at once, the frames of larger defs are done in batches
+    # returns the written archive members
     s = int(scale)
+    load = data if callable(data) else lambda files: {x: data[x] for x in files if x in data}
+    boxes = {}
+    aliases = {}
+    seen = {}
+    members = []
+    for files in __frame_batches(plan, s, memory):
+        batch = __batch_plan(plan, files)
+        frames = {x:Frame(y) for x, y in load(files).items()}
+        boxes.update(__handle_frames(archive, frames, batch, scale, flag_img, png, dedup, trim, stats, aliases, seen, members))
+        del frames
+    members.append("sprites" + scale + "x/" + plan.folder + ".json")
+    archive.writestr(members[-1], create_animation_config(plan.folder, plan.animation, aliases, boxes if trim else None, (plan.width * s, plan.height * s)))
+    return members
 
-    # skip menu buttons (RoE)
-    if folder.upper() in ["MMENUNG", "MMENULG", "MMENUHS", "MMENUCR", "MMENUQT", "GTSINGL", "GTMULTI", "GTCAMPN", "GTTUTOR", "GTBACK", "GTSINGL", "GTMULTI", "GTCAMPN", "GTTUTOR", "GTBACK"]:
-        return
-    
-    # skip dialogbox - coloring not supported yet by vcmi
-    if folder.upper() in ["dialgbox"]:
-        return
+def __frame_batches(plan, s, memory):
+    # lists of files of whole frames whose padded images fit into memory (at least one frame),
+    # all files at once without a budget
+    if memory is None:
+        return [plan.files]
+    groups = {}
+    for file in plan.files:
+        groups.setdefault(frame_name(file).upper(), []).append(file)
+    frame_bytes = plan.width * s * plan.height * s * 4
+    batches = [[]]
+    for files in groups.values():
+        if len(batches[-1]) > 0 and (len(batches[-1]) + len(files)) * frame_bytes > memory:
+            batches.append([])
+        batches[-1] += files
+    return batches
 
-    # skip water + rivers special handling - paletteAnimation - not supported yet by vcmi
-    if folder.upper() in ["WATRTL", "LAVATL"] + ["CLRRVR", "MUDRVR", "LAVRVR"]:
-        return
+def __batch_plan(plan, files):
+    # plan restricted to some of its files
+    if files is plan.files:
+        return plan
+    names = set(files)
+    return plan._replace(
+        positions={x: y for x, y in plan.positions.items() if x in names},
+        flags={x: y for x, y in plan.flags.items() if x in names},
+        outlines=[x for x in plan.outlines if x in names],
+        files=files
+    )
+
+def __handle_frames(archive, data, plan, scale, flag_img, png, dedup, trim, stats, aliases, seen, members):
+    # pads, decorates and writes the files of a plan, returns the trim boxes of its frames and
+    # adds to the dedup aliases and written members
+    s = int(scale)
 
-    # resize def
-    max_size_x = df["full_width"].max() * s
-    max_size_y = df["full_height"].max() * s
-    for item in data.keys():
-        name = os.path.splitext(item.replace(".shadow", ""))[0].upper()
-        df_tmp = df[df["imagename"].str.upper() == name]
-        df_pak_tmp = df_pak[df_pak[2].str.upper() == name]
-        if len(df_tmp) > 0:
-            df_row = df_tmp.iloc[0]
-            offset_sdhd_x = df_pak_tmp.iloc[0][4]
-            offset_sdhd_y = df_pak_tmp.iloc[0][6]
-            img = Image.open(io.BytesIO(data[item]))
-            tmpimg = Image.new(img.mode, (max_size_x, max_size_y), (255, 255, 255, 0))
-            tmpimg.paste(img, ((df_row["left_margin"] - offset_sdhd_x) * s, (df_row["top_margin"] - offset_sdhd_y) * s))
-            img_byte_arr = io.BytesIO()
-            tmpimg.save(img_byte_arr, format='PNG')
-            data[item] = img_byte_arr.getvalue()
+    # resize def, with trim only to the part of the def canvas used by the files of a frame
+    with stats.stage("pad"):
+        boxes = trim_boxes(data, plan, s, flag_img) if trim else {}
+        canvas = (0, 0, plan.width * s, plan.height * s)
+        for item, (x, y) in plan.positions.items():
+            img = data[item].image
+            left, top, right, bottom = boxes.get(frame_name(item).upper(), canvas)
+            tmpimg = Image.new(img.mode, (right - left, bottom - top), (255, 255, 255, 0))
+            tmpimg.paste(img, (x * s - left, y * s - top))
+            data[item].image = tmpimg
     
+    with stats.stage("flags"):
+        __add_flags(data, plan, s, flag_img, boxes, canvas)
+
+    with stats.stage("outline"):
+        __add_outlines(data, plan)
+
+    # frames equal to an earlier frame, including shadow and overlays, are not written
+    with stats.stage("dedup"):
+        if dedup:
+            aliases.update(find_duplicate_frames(data, plan, boxes, seen))
+
+    # png encoding happens only here, once per file, on the archive threads
+    for file in plan.files:
+        name = frame_name(file).upper()
+        if name in aliases and aliases[name].upper() != name:
+            continue
+        members.append("sprites" + scale + "x/" + plan.folder + "/" + file.replace(".shadow", "-shadow"))
+        archive.writestr(members[-1], stats.timed("png_encode", functools.partial(data[file].png, **(png or {}))), data[file].memory())
+        stats.count("images_written")
+    return boxes
+
+def __add_flags(data, plan, s, flag_img, boxes, canvas):
     # add flag overlay images
-    for item in list(data.keys()):
+    for item, flag in plan.flags.items():
         name = os.path.splitext(item)[0]
-        df_flag_tmp = df_flag[df_flag[0].str.upper() == name.upper()]
-        if len(df_flag_tmp) > 0:
-            df_flag_tmp = df_flag_tmp.iloc[0]
-            img = Image.open(io.BytesIO(data[item]))
-            img = Image.new(img.mode, (img.width, img.height), (255, 255, 255, 0))
-            for i in range(df_flag_tmp[1]):
-                flag = flag_img[int(df_flag_tmp[4+i*3])][s]
-                img.paste(flag, (int(df_flag_tmp[2+i*3])*s, int(df_flag_tmp[3+i*3])*s), flag)
-                img_byte_arr = io.BytesIO()
-                img.save(img_byte_arr, format='PNG')
-                data[name + "-overlay.png"] = img_byte_arr.getvalue()
+        left, top = boxes.get(frame_name(item).upper(), canvas)[:2] if item in plan.positions else (0, 0)
+        img = data[item].image
+        img = Image.new(img.mode, (img.width, img.height), (255, 255, 255, 0))
+        for i in range(flag[1]):
+            flag_tmp = flag_img[int(flag[4+i*3])][s]
+            img.paste(flag_tmp, (int(flag[2+i*3])*s - left, int(flag[3+i*3])*s - top), flag_tmp)
+        data[name + "-overlay.png"] = Frame(img)
 
+def __add_outlines(data, plan):
     # create outlines for creatures as overlay
-    for item in list(data.keys()):
-        name = os.path.splitext(item)[0]
-        creature_images = [x.upper() for x in ["CABEHE", "CADEVL", "CAELEM", "CALIZA", "CAMAGE", "cangel", "CAPEGS", "CBASIL", "CBDRGN", "CBDWAR", "cbehol", "Cbgog", "CBKNIG", "CBLORD", "CBTREE", "CBWLFR", "CCAVLR", "CCENTR", "CCERBU", "Ccgorg", "CCHAMP", "cchydr", "CCMCOR", "Ccrusd", "CcyclLor", "CCYCLR", "CDDRAG", "CDEVIL", "CDGOLE", "CDRFIR", "CDRFLY", "CDWARF", "CECENT", "CEELEM", "cefree", "cefres", "CELF", "Ceveye", "CFAMIL", "CFELEM", "CGARGO", "CGBASI", "CGDRAG", "CGENIE", "CGGOLE", "CGNOLL", "CGNOLM", "CGOBLI", "CGOG", "CGRELF", "CGREMA", "CGREMM", "CGRIFF", "CGTITA", "chalbd", "CHARPH", "CHARPY", "CHCBOW", "CHDRGN", "CHGOBL", "CHHOUN", "CHYDRA", "CIGOLE", "CIMP", "Citrog", "CLCBOW", "CLICH", "CLTITA", "CMAGE", "CMAGOG", "CMCORE", "Cmeduq", "Cmedus", "Cminok", "CMINOT", "Cmonkk", "CNAGA", "CNAGAG", "CNDRGN", "CNOSFE", "COGARG", "COGMAG", "COGRE", "COHDEM", "CORCCH", "CORC", "CPEGAS", "CPFIEN", "CPFOE", "CPKMAN", "CPLICH", "CPLIZA", "CRANGL", "CRDRGN", "Crgrif", "CROC", "CSGOLE", "CSKELE", "CSULTA", "Csword", "CTBIRD", "CTHDEM", "CTREE", "Ctrogl", "CUNICO", "CUWLFR", "CVAMP", "CWELEM", "CWIGHT", "CWRAIT", "CWSKEL", "CWUNIC", "CWYVER", "CWYVMN", "CYBEHE", "Czealt", "CZOMBI", "CZOMLO"]]
-        if name.upper().startswith(tuple(creature_images)) and "shadow".upper() not in name.upper():
-            img = Image.open(io.BytesIO(data[item]))
-            alpha = img.split()[-1]
-            alpha = ImageEnhance.Brightness(alpha).enhance(5)
-            img = Image.new("RGBA", img.size, (0,0,0,0))
-            img.paste(alpha, mask=alpha)
-            img = img.filter(ImageFilter.FIND_EDGES)
-            img = img.filter(ImageFilter.MaxFilter(3))
-            img_byte_arr = io.BytesIO()
-            img.save(img_byte_arr, format='PNG')
-            data[name + "-overlay.png"] = img_byte_arr.getvalue()
-
-    for file, content in data.items():
-        file = file.replace(".shadow", "-shadow")
-        archive.writestr("sprites" + scale + "x/" + folder + "/" + file, content)
-    archive.writestr("sprites" + scale + "x/" + folder + ".json", create_animation_config(folder, data.keys(), df))
+    pending = list(plan.outlines)
+    while len(pending) > 0:
+        # all frames at once, unless a frame is the overlay of another one (outline of an outline)
+        batch = []
+        for item in pending:
+            if any(item == os.path.splitext(x)[0] + "-overlay.png" for x in batch):
+                break
+            batch.append(item)
+        pending = pending[len(batch):]
+        for item, img in zip(batch, outlines([data[x].image for x in batch])):
+            data[os.path.splitext(item)[0] + "-overlay.png"] = Frame(img)
+
+def frame_name(file):
+    # frame a file belongs to: <frame>.png, <frame>.shadow.png, <frame>-overlay.png, <frame>.shadow-overlay.png
+    # (and overlays of overlays)
+    name = os.path.splitext(file)[0]
+    while name.endswith("-overlay"):
+        name = name[:-len("-overlay")]
+    return name[:-len(".shadow")] if name.endswith(".shadow") else name
+
+def trim_boxes(data, plan, s, flag_img):
+    # upper case frame name -> box on the def canvas shared by the files of a frame: the opaque
+    # bounds of the frame and shadow, the flags and 2 pixels around them per outline. An outline
+    # reaches 2 pixels beyond its image, so the trimmed files compose to the padded ones exactly.
+    bounds = {}
+    def add(name, box):
+        if bounds[name] is not None:
+            box = (min(box[0], bounds[name][0]), min(box[1], bounds[name][1]), max(box[2], bounds[name][2]), max(box[3], bounds[name][3]))
+        bounds[name] = box
+
+    for item, (x, y) in plan.positions.items():
+        name = frame_name(item).upper()
+        bounds.setdefault(name, None)
+        img = data[item].image
+        bbox = img.getchannel("A").getbbox() if img.mode == "RGBA" else (0, 0, img.width, img.height)
+        if bbox is not None:
+            add(name, (bbox[0] + x * s, bbox[1] + y * s, bbox[2] + x * s, bbox[3] + y * s))
+    for item, flag in plan.flags.items():
+        if item in plan.positions:
+            for i in range(flag[1]):
+                flag_tmp = flag_img[int(flag[4+i*3])][s]
+                x, y = int(flag[2+i*3])*s, int(flag[3+i*3])*s
+                add(frame_name(item).upper(), (x, y, x + flag_tmp.width, y + flag_tmp.height))
+    margins = {}
+    for item in plan.outlines:
+        name = frame_name(item).upper()
+        margins[name] = margins.get(name, 0) + 2
+
+    boxes = {}
+    for name, box in bounds.items():
+        m = margins.get(name, 0)
+        if box is not None:
+            box = (max(box[0] - m, 0), max(box[1] - m, 0), min(box[2] + m, plan.width * s), min(box[3] + m, plan.height * s))
+        if box is None or box[0] >= box[2] or box[1] >= box[3]:
+            box = (0, 0, 1, 1) # nothing visible
+        boxes[name] = box
+    return boxes
+
+def find_duplicate_frames(data, plan, boxes=None, seen=None):
+    # upper case frame name -> name of the first animation frame with identical files.
+    # vcmi finds shadow and overlay by the frame file name, so only complete frames are shared.
+    # boxes: trimmed frames are only equal at the same position
+    # seen: frames of earlier calls for the same def (batches of frames), updated
+    boxes = boxes or {}
+    seen = {} if seen is None else seen
+    files = {}
+    for file in plan.files:
+        files.setdefault(frame_name(file).upper(), []).append(file)
+    aliases = {}
+    for row in plan.animation:
+        name = row.imagename.upper()
+        if name in aliases or name not in files:
+            continue
+        key = (boxes.get(name), tuple(sorted((file[len(name):].lower(), data[file].digest()) for file in files[name])))
+        aliases[name] = seen.setdefault(key, row.imagename)
+    return aliases
 
 def create_mod_config():
     conf = {
@@ -206,19 +468,23 @@ def create_lang_mod_config(scale, language):
     }
     return json.dumps(conf, indent=4, ensure_ascii=False)
 
-def create_animation_config(name, files, df):
-    files = sorted(files)
-
+def create_animation_config(name, sprites, aliases=None, boxes=None, size=None):
+    # aliases: upper case frame name -> frame whose file is used instead
+    # boxes: upper case frame name -> box of a trimmed frame on the def canvas of the given size
+    aliases = aliases or {}
     conf = {
         "basepath": name + "/",
         "images": [
             {
-                "group": row["group"],
-                "frame": row["frame"],
-                "file": row["imagename"] + ".png"
+                "group": row.group,
+                "frame": row.frame,
+                "file": aliases.get(row.imagename.upper(), row.imagename) + ".png"
             }
-            for i, row in df.iterrows()
-            if row["imagename"].upper() in [os.path.splitext(x)[0].upper() for x in files]
+            for row in sprites
         ]
     }
-    return json.dumps(conf, indent=4, ensure_ascii=False)
\ No newline at end of file
+    if boxes is not None:
+        conf["width"], conf["height"] = size
+        for image, row in zip(conf["images"], sprites):
+            image["x"], image["y"] = boxes.get(row.imagename.upper(), (0, 0))[:2]
+    return json.dumps(conf, indent=4, ensure_ascii=False)
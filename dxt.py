@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2024 Laserlicht
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import struct
+import numpy as np
+
+# DXT1/DXT3/DXT5 dds images decoded in numpy, only the 4x4 blocks covering a requested
+# rectangle are decoded. Results are byte identical to the PIL BCn decoder (same
+# 565 expansion, integer interpolation and 3 color mode for DXT1).
+# Other formats are left to PIL (open returns None).
+
+_BLOCK_SIZES = { b'DXT1': 8, b'DXT3': 16, b'DXT5': 16 }
+
+class DdsImage:
+    def __init__(self, data, width, height, fourcc):
+        self.data = data
+        self.width = width
+        self.height = height
+        self.size = (width, height)
+        self.fourcc = fourcc
+        block_size = _BLOCK_SIZES[fourcc]
+        blocks_x = (width + 3) // 4
+        blocks_y = (height + 3) // 4
+        self.__blocks = np.frombuffer(data, np.uint8, blocks_x * blocks_y * block_size, 128).reshape(blocks_y, blocks_x, block_size)
+
+    def decode(self, box):
+        # RGBA array (height x width x 4) of box = (left, upper, right, lower), the result is a view
+        # into the decoded blocks covering the box
+        left, upper, right, lower = box
+        bx0, by0 = left // 4, upper // 4
+        bx1, by1 = (right + 3) // 4, (lower + 3) // 4
+        blocks = self.__blocks[by0:by1, bx0:bx1]
+        if self.fourcc == b'DXT1':
+            rgba = _decode_color(blocks, False)
+        else:
+            rgba = _decode_color(blocks[..., 8:], True)
+            if self.fourcc == b'DXT3':
+                rgba[..., 3] = _decode_dxt3_alpha(blocks)
+            else:
+                rgba[..., 3] = _decode_dxt5_alpha(blocks)
+        # blocks x 16 pixels -> rows x columns
+        rgba = rgba.reshape(blocks.shape[0], blocks.shape[1], 4, 4, 4).transpose(0, 2, 1, 3, 4).reshape(blocks.shape[0] * 4, blocks.shape[1] * 4, 4)
+        return rgba[upper - by0 * 4:lower - by0 * 4, left - bx0 * 4:right - bx0 * 4]
+
+def open(data):
+    # DdsImage of dds file data or None if the format is not supported here
+    data = memoryview(data)
+    if len(data) < 128 or data[:4] != b'DDS ':
+        return None
+    height, width = struct.unpack_from('<II', data, 12)
+    pf_flags, fourcc = struct.unpack_from('<I4s', data, 80)
+    if not pf_flags & 0x4 or fourcc not in _BLOCK_SIZES:
+        return None
+    if len(data) < 128 + ((width + 3) // 4) * ((height + 3) // 4) * _BLOCK_SIZES[fourcc]:
+        return None
+    return DdsImage(data, width, height, fourcc)
+
+def crop(img, box, rotation):
+    # RGBA array of box rotated clockwise by rotation * 90 degrees, like
+    # Image.crop(box).rotate(-90 * rotation, expand=True) on the full image
+    return np.rot90(img.decode(box), -rotation)
+
+def _expand(c):
+    # 565 color -> r, g, b
+    r = (c >> 11) & 0x1f
+    g = (c >> 5) & 0x3f
+    b = c & 0x1f
+    return np.stack([(r << 3) | (r >> 2), (g << 2) | (g >> 4), (b << 3) | (b >> 2)], -1)
+
+def _decode_color(blocks, separate_alpha):
+    # blocks x 16 x RGBA
+    c0 = blocks[..., 0:2].copy().view('<u2')[..., 0].astype(np.int32)
+    c1 = blocks[..., 2:4].copy().view('<u2')[..., 0].astype(np.int32)
+    lut = blocks[..., 4:8].copy().view('<u4')[..., 0]
+    p0 = _expand(c0)
+    p1 = _expand(c1)
+    p = np.empty(blocks.shape[:2] + (4, 4), np.int32)
+    p[..., 0, :3] = p0
+    p[..., 1, :3] = p1
+    p[..., :, 3] = 255
+    four = (c0 > c1) | separate_alpha
+    p[..., 2, :3] = np.where(four[..., None], (2 * p0 + p1) // 3, (p0 + p1) // 2)
+    p[..., 3, :3] = np.where(four[..., None], (p0 + 2 * p1) // 3, 0)
+    p[..., 3, 3] = np.where(four, 255, 0)
+    index = (lut[..., None] >> (2 * np.arange(16, dtype=np.uint32))) & 3
+    return np.take_along_axis(p, index[..., None].astype(np.intp), axis=2).astype(np.uint8)
+
+def _decode_dxt3_alpha(blocks):
+    a = blocks[..., 0:8]
+    a = np.stack([a & 0xf, a >> 4], -1).reshape(blocks.shape[:2] + (16,))
+    return (a << 4) | a
+
+def _decode_dxt5_alpha(blocks):
+    a0 = blocks[..., 0].astype(np.int32)
+    a1 = blocks[..., 1].astype(np.int32)
+    a = np.empty(blocks.shape[:2] + (8,), np.int32)
+    a[..., 0] = a0
+    a[..., 1] = a1
+    eight = (a0 > a1)[..., None]
+    k = np.arange(1, 7)
+    a[..., 2:8] = np.where(eight, ((7 - k) * a0[..., None] + k * a1[..., None]) // 7, 0)
+    k = np.arange(1, 5)
+    a[..., 2:6] = np.where(eight, a[..., 2:6], ((5 - k) * a0[..., None] + k * a1[..., None]) // 5)
+    a[..., 6] = np.where(eight[..., 0], a[..., 6], 0)
+    a[..., 7] = np.where(eight[..., 0], a[..., 7], 255)
+    lut = np.zeros(blocks.shape[:2], np.uint64)
+    for n in range(6):
+        lut |= blocks[..., 2 + n].astype(np.uint64) << np.uint64(8 * n)
+    index = (lut[..., None] >> (3 * np.arange(16, dtype=np.uint64))) & np.uint64(7)
+    return np.take_along_axis(a, index.astype(np.intp), axis=2).astype(np.uint8)
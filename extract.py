@@ -24,135 +24,316 @@
 
 import os
 import io
-import zlib
+import json
+import queue
 import shutil
+import contextlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import numpy as np
 from PIL import Image
+import dxt
+from pak import PakArchive, find_paks
+from spriteindex import SPRITES_CSV, compile_index
+from manifest import ManifestRow, ManifestWriter, parse_line
+from instrument import Stats, NO_STATS
+from progress import Progress
+from selection import ALL
+from store import FolderStore, PackStore, MemoryStore, PACK_FILE, key as store_key
 
-def extract_assets(in_folder, out_folder, save_dds=False):
+def extract_assets(in_folder, out_folder, save_dds=False, workers=1, cache=True, threads=1, langs=None, select=None, pack=False, memory=None, stats=None, progress=None, cancel=None):
+    # cache: skip entries whose fingerprint and output files are unchanged since the last run
+    # threads: inflate the chunks of an entry concurrently (per worker process)
+    # langs: languages (data/LOC folder names) to extract, default all
+    # select: selection.Selection of the pak entries to extract, the info.csv rows of the other
+    #         entries are kept from the previous run
+    # pack: write the images into one pack file (store.PackStore) instead of loose files,
+    #       create_mod reads from whichever is in the folder
+    # memory: budget in MB for the inflated entries in flight with workers, entries are queued
+    #         until earlier ones are done. Without workers one entry is in flight anyway.
+    # stats: instrument.Stats collecting stage timings and counters
+    # progress: callback getting a progress.ProgressEvent per extracted pak entry
+    # cancel: threading.Event, raises progress.Cancelled when set. info.csv and sprites.idx of the
+    #         previous run stay in place, finished entries are kept in the cache for the next run.
+    stats = stats or NO_STATS
+    select = select or ALL
+    progress = Progress(progress, cancel)
     data_dir = os.path.join(in_folder, "data")
-    shutil.copytree(data_dir, os.path.join(out_folder, "data"), dirs_exist_ok=True)
-
-    if os.path.isfile(os.path.join(out_folder, "info.csv")):
-        os.remove(os.path.join(out_folder, "info.csv"))
-
-    for scale in ["2", "3"]:
-        for filename in os.listdir(data_dir):
-            if filename.lower().endswith(".pak") and "x" + scale in filename:
-                full_name = os.path.join(data_dir, filename)
-                __extract_pak(full_name, "", out_folder, save_dds)
-        for filename in os.listdir(os.path.join(data_dir, 'LOC', list(os.listdir(os.path.join(data_dir, 'LOC')))[0])):
-            if filename.lower().endswith(".pak") and "x" + scale in filename:
-                lang = list(os.listdir(os.path.join(data_dir, 'LOC')))[0]
-                full_name = os.path.join(data_dir, 'LOC', lang, filename)
-                __extract_pak(full_name, lang, out_folder, save_dds)
-
-def __extract_pak(file, lang, out_folder, save_dds):
-    with open(file, 'rb') as f:
-        f.read(4) # dummy
-        info_offset = int.from_bytes(f.read(4), byteorder='little')
-        f.seek(info_offset)
-        files = int.from_bytes(f.read(4), byteorder='little')
-        offset_name = f.tell()
-        for i in range(files):
-            f.seek(offset_name)
-            name = f.read(8).split(b'\0', 1)[0].decode()
-            f.read(12) # dummy
-            offset = int.from_bytes(f.read(4), byteorder='little')
-            dummy_size = int.from_bytes(f.read(4), byteorder='little')
-            chunks = int.from_bytes(f.read(4), byteorder='little')
-            zsize = int.from_bytes(f.read(4), byteorder='little')
-            size = int.from_bytes(f.read(4), byteorder='little')
-            chunk_zsize_arr = []
-            for j in range(chunks):
-                chunk_zsize = int.from_bytes(f.read(4), byteorder='little')
-                chunk_zsize_arr.append(chunk_zsize)
-            chunk_size_arr = []
-            for j in range(chunks):
-                chunk_size = int.from_bytes(f.read(4), byteorder='little')
-                chunk_size_arr.append(chunk_size)
-            offset_name = f.tell()
-
-            f.seek(offset)
-            image_config = f.read(dummy_size).decode()
-            offset += dummy_size
-
-            data = bytearray(b'')
-            data_compressed = bytearray(b'')
-            for j in range(chunks):
-                f.seek(offset)
-                if chunk_zsize_arr[j] == chunk_size_arr[j]:
-                    data += bytearray(f.read(chunk_size))
+    with stats.stage("copy_data"):
+        shutil.copytree(data_dir, os.path.join(out_folder, "data"), dirs_exist_ok=True, copy_function=__copy_changed)
+
+    paks = find_paks(data_dir, langs)
+    total = 0
+    for file, lang in paks:
+        with PakArchive(file) as pak:
+            total += len(select.indices(pak))
+    progress.start("extract", total)
+    cached = __load_cache(out_folder) if cache or select else {}
+    entries = {}
+
+    if not pack:
+        with contextlib.suppress(OSError):
+            os.remove(os.path.join(out_folder, PACK_FILE))
+    info_file = os.path.join(out_folder, "info.csv")
+    with PackStore(os.path.join(out_folder, PACK_FILE), writable=True) if pack else FolderStore(out_folder) as store:
+        try:
+            with ManifestWriter(info_file + ".tmp") as info:
+                if workers > 1:
+                    __extract_parallel(paks, out_folder, store, save_dds, workers, threads, cached, cache, select, None if memory is None else memory << 20, entries, info, stats, progress)
                 else:
-                    data_compressed += bytearray(f.read(zsize))
-                offset += chunk_zsize
-            if len(data_compressed) != 0:
-                to_decompress = data_compressed
-                data_compressed = []
-                while len(to_decompress) > 0:
-                    dec = zlib.decompressobj()
-                    try:
-                        data_compressed.append(dec.decompress(to_decompress))
-                        to_decompress = dec.unused_data
-                    except:
-                        break
-                pass
-            if len(data) < len(data_compressed):
-                data = data_compressed
-            else:
-                data = [data]
-            
-            __extract_images(os.path.basename(file), name, image_config, data, lang, out_folder, save_dds)
-
-def __extract_images(file, name, image_config, data, lang, out_folder, save_dds):
-    img = [Image.open(io.BytesIO(x)) for x in data]
-    for line in image_config.split('\r\n'):
-        tmp = line.split(' ')
-        if len(tmp) > 11:
-            img_name = tmp[0]
-            img_nr = int(tmp[1])
-            img_val1 = int(tmp[2]) # x offset between hd and sd sprites
-            img_val2 = int(tmp[3])
-            img_val3 = int(tmp[4]) # y offset between hd and sd sprites
-            img_val4 = int(tmp[5])
-            img_x = int(tmp[6])
-            img_y = int(tmp[7])
-            img_width = int(tmp[8])
-            img_height = int(tmp[9])
-            img_rotation = int(tmp[10])
-            img_has_shadow = int(tmp[11])
-
-            img_crop = img[img_nr]
-            img_crop = img_crop.crop((img_x, img_y, img_x+img_width, img_y+img_height))
-            img_crop = img_crop.rotate(-90 * img_rotation, expand=True)
-
-            img_shadow_crop = None
-            if img_has_shadow == 1:
-                img_shadow_nr = int(tmp[12])
-                img_shadow_x = int(tmp[13])
-                img_shadow_y = int(tmp[14])
-                img_shadow_width = int(tmp[15])
-                img_shadow_height = int(tmp[16])
-                img_shadow_rotation = int(tmp[17])
-
-                img_shadow_crop = img[img_shadow_nr]
-                img_shadow_crop = img_shadow_crop.crop((img_shadow_x, img_shadow_y, img_shadow_x+img_shadow_width, img_shadow_y+img_shadow_height))
-                img_shadow_crop = img_shadow_crop.rotate(-90 * img_shadow_rotation, expand=True)
-
-            with open(os.path.join(out_folder, "info.csv"), "a") as f:
-                f.write("%s;%s;%s\r\n"%(file, name, line.replace(' ', ';')))
-
-            if 'sprite' in file.lower():
-                if not os.path.exists(os.path.join(out_folder, file, lang, name)): os.makedirs(os.path.join(out_folder, file, lang, name), exist_ok=True)
-                img_crop.save(os.path.join(out_folder, file, lang, name, img_name + ".png"))
-                
-                if img_shadow_crop is not None:
-                    img_shadow_crop.save(os.path.join(out_folder, file, lang, name, img_name + ".shadow.png"))
-            else:
-                if not os.path.exists(os.path.join(out_folder, file, lang)): os.makedirs(os.path.join(out_folder, file, lang), exist_ok=True)
-                img_crop.save(os.path.join(out_folder, file, lang, img_name + ".png"))
-                if img_shadow_crop is not None:
-                    img_shadow_crop.save(os.path.join(out_folder, file, lang, img_name + ".shadow.png"))
+                    with ThreadPoolExecutor(max_workers=threads) if threads > 1 else __no_pool() as executor:
+                        for file, lang in paks:
+                            __extract_pak(file, lang, store, save_dds, cached, cache, select, entries, info, executor, stats, progress)
+        except BaseException:
+            __save_cache(out_folder, {**cached, **entries})
+            with contextlib.suppress(OSError):
+                os.remove(info_file + ".tmp")
+            raise
+    os.replace(info_file + ".tmp", info_file)
+    __save_cache(out_folder, entries)
+
+    # precompile the sprite metadata for create_mod
+    with stats.stage("index"):
+        compile_index(os.path.join(out_folder, "sprites.idx"), SPRITES_CSV, os.path.join(out_folder, "info.csv"), os.path.join(out_folder, "data", "spriteFlagsInfo.txt"))
+
+def extracted_entries(out_folder):
+    # cache records of the last extraction by "<pak file>/<lang>/<entry>"
+    return __load_cache(out_folder)
+
+def __copy_changed(src, dst):
+    # the game data folder is copied on every run, skip files that are already there
+    if os.path.isfile(dst):
+        src_stat, dst_stat = os.stat(src), os.stat(dst)
+        if src_stat.st_size == dst_stat.st_size and int(src_stat.st_mtime) == int(dst_stat.st_mtime):
+            return dst
+    return shutil.copy2(src, dst)
+
+def __load_cache(out_folder):
+    try:
+        with open(os.path.join(out_folder, "extract_cache.json")) as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if cache.get("version") != __CACHE_VERSION:
+        return {}
+    return cache["entries"]
+
+def __save_cache(out_folder, entries):
+    with open(os.path.join(out_folder, "extract_cache.json.tmp"), "w") as f:
+        json.dump({"version": __CACHE_VERSION, "entries": entries}, f)
+    os.replace(os.path.join(out_folder, "extract_cache.json.tmp"), os.path.join(out_folder, "extract_cache.json"))
+
+__CACHE_VERSION = 4
+
+def __entry_key(file, lang, name):
+    return "/".join([os.path.basename(file), lang, name])
+
+def __no_pool():
+    return contextlib.nullcontext(None)
+
+def __cached(cached, key, store):
+    # cache record of an entry if its output files are still there
+    record = cached.get(key)
+    if record is None:
+        return None
+    for file, size in record["outputs"].items():
+        if store.size(file) != size:
+            return None
+    return record
+
+def __extract_pak(file, lang, store, save_dds, cached, cache, select, entries, info, executor=None, stats=NO_STATS, progress=None):
+    # cache: whether cached records of selected entries are used, the records of entries that
+    # are not selected are always kept
+    with stats.stage("pak_open"):
+        pak = PakArchive(file)
+    with pak:
+        selected = set(select.indices(pak))
+        for i in range(len(pak)):
+            key = __entry_key(file, lang, pak.names[i])
+            if i not in selected:
+                if key in cached:
+                    entries[key] = cached[key]
+                    info.write(ManifestRow(*x) for x in entries[key]["info"])
+                continue
+            with stats.item("entry", key):
+                entries[key] = __extract_entry(pak, i, lang, store, save_dds, __cached(cached, key, store) if cache else None, executor, stats)
+            info.write(ManifestRow(*x) for x in entries[key]["info"])
+            if progress is not None:
+                progress.advance()
+
+def __extract_parallel(paks, out_folder, store, save_dds, workers, threads, cached, cache, select, memory, entries, info, stats=NO_STATS, progress=None):
+    tasks = []
+    keys = []
+    sizes = []
+    results = {} # records of the entries that are not selected are kept from the cache
+    for file, lang in paks:
+        with PakArchive(file) as pak:
+            selected = set(select.indices(pak))
+            for i in range(len(pak)):
+                key = __entry_key(file, lang, pak.names[i])
+                if i in selected:
+                    tasks.append((file, i, lang, out_folder, isinstance(store, PackStore), save_dds, threads, __cached(cached, key, store) if cache else None, stats is not NO_STATS))
+                elif key in cached:
+                    results[len(keys)] = (cached[key], None, None)
+                    tasks.append(None)
+                else:
+                    continue
+                keys.append(key)
+                sizes.append(pak.sizes[i])
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # submit the biggest entries first to avoid a long tail, but merge info.csv in pak order.
+        # With a memory budget entries are submitted while their inflated sizes fit, at least one.
+        queued = [k for k in sorted(range(len(tasks)), key=lambda k: sizes[k]) if tasks[k] is not None]
+        futures = {}
+        done = queue.Queue() # finished futures
+        in_flight = 0
+        written = 0
+        def write_done():
+            nonlocal written
+            while written in results:
+                key = keys[written]
+                entries[key], report, files = results.pop(written)
+                if report is not None:
+                    stats.merge(report)
+                for x, data in (files or {}).items():
+                    store.write(x, data)
+                info.write(ManifestRow(*x) for x in entries[key]["info"])
+                written += 1
+        try:
+            write_done()
+            while len(queued) > 0 or len(futures) > 0:
+                while len(queued) > 0 and (memory is None or len(futures) == 0 or in_flight + sizes[queued[-1]] <= memory):
+                    k = queued.pop()
+                    future = executor.submit(__extract_task, tasks[k])
+                    future.add_done_callback(done.put)
+                    futures[future] = k
+                    in_flight += sizes[k]
+                future = done.get()
+                k = futures.pop(future)
+                in_flight -= sizes[k]
+                results[k] = future.result()
+                write_done()
+                if progress is not None:
+                    progress.advance()
+        except BaseException:
+            # running entries finish writing their files before the caller saves the cache
+            executor.shutdown(wait=True, cancel_futures=True)
+            raise
+
+__paks = {} # opened archives of a worker process
+__pool = None # chunk inflate threads of a worker process
+__stores = {} # folder stores of a worker process
+
+def __extract_task(task):
+    global __pool
+    # returns the cache record, the stats report of the entry (None without instrumentation) and
+    # the written files for the pack of the main process (None for a folder store)
+    file, i, lang, out_folder, pack, save_dds, threads, cached, instrument = task
+    stats = Stats() if instrument else NO_STATS
+    store = MemoryStore() if pack else __stores.setdefault(out_folder, FolderStore(out_folder))
+    if file not in __paks:
+        with stats.stage("pak_open"):
+            __paks[file] = PakArchive(file)
+    if threads > 1 and __pool is None:
+        __pool = ThreadPoolExecutor(max_workers=threads)
+    pak = __paks[file]
+    with stats.item("entry", __entry_key(file, lang, pak.names[i])):
+        record = __extract_entry(pak, i, lang, store, save_dds, cached, __pool, stats)
+    return record, stats.report() if instrument else None, store.files if pack else None
+
+def __extract_entry(pak, i, lang, store, save_dds, cached, executor=None, stats=NO_STATS):
+    # returns the cache record of the entry: fingerprint, directory fingerprint (for the fingerprints
+    # of create_mod), info.csv rows and output files with their sizes
+    # cached: record of the last run with the output files still in the store or None
+    with stats.stage("fingerprint"):
+        fingerprint = pak.fingerprint(i) + (".dds" if save_dds else "")
+        unchanged = cached is not None and cached["fingerprint"] == fingerprint
+    if unchanged:
+        stats.count("entries_cached")
+        return cached
+    with stats.stage("inflate"):
+        data = pak.read(i, executor)
+    stats.count("entries")
+    stats.count("bytes_read", pak.config_sizes[i] + pak.zsizes[i])
+    stats.count("bytes_inflated", sum(len(x) for x in data))
+    info, outputs = __extract_images(os.path.basename(pak.file), pak.names[i], pak.config(i), data, lang, store, save_dds, stats)
+    return {
+        "fingerprint": fingerprint,
+        "source": pak.directory_fingerprint(i),
+        "info": [list(x) for x in info],
+        "outputs": {x: store.size(x) for x in outputs}
+    }
+
+def __extract_images(file, name, image_config, data, lang, store, save_dds, stats=NO_STATS):
+    info = []
+    outputs = []
+    path = store_key(file, lang, name) if 'sprite' in file.lower() else store_key(file, lang)
+    with stats.stage("decode"):
+        img = decode_images(data)
+        rows = parse_config(file, name, image_config)
+    stats.count("images_decoded", len(img))
+    for row in rows:
+        with stats.stage("crop"):
+            row, img_crop, img_shadow_crop = crop_row(row, img)
+        info.append(row)
+        img_name = row.image
+
+        outputs.append(store_key(path, img_name + ".png"))
+        __save(img_crop, store, outputs[-1], stats)
+        if img_shadow_crop is not None:
+            outputs.append(store_key(path, img_name + ".shadow.png"))
+            __save(img_shadow_crop, store, outputs[-1], stats)
     if save_dds:
         for i in range(len(img)):
-            img[i].save(os.path.join(out_folder, file, lang, name + "." + str(i) + ".dds.png"))
-            open(os.path.join(out_folder, file, lang, name + "." + str(i) + ".dds"), 'wb').write(data[i])
+            outputs.append(store_key(file, lang, name + "." + str(i) + ".dds.png"))
+            __save(Image.open(io.BytesIO(data[i])), store, outputs[-1], stats)
+            outputs.append(store_key(file, lang, name + "." + str(i) + ".dds"))
+            store.write(outputs[-1], data[i])
+    return info, outputs
+
+def __save(img, store, file, stats):
+    with stats.stage("png_encode"):
+        buffer = io.BytesIO()
+        img.save(buffer, format="PNG")
+    with stats.stage("write"):
+        store.write(file, buffer.getbuffer())
+    stats.count("images_encoded")
+    stats.count("bytes_written", buffer.tell())
+
+def decode_images(data):
+    # DXT images are decoded by region when they are cropped, other formats are decoded by PIL
+    ret = []
+    for x in data:
+        img = dxt.open(x)
+        ret.append(img if img is not None else Image.open(io.BytesIO(x)))
+    return ret
+
+def __crop(img, box, rotation):
+    if isinstance(img, dxt.DdsImage):
+        if box[0] >= 0 and box[1] >= 0 and box[2] <= img.width and box[3] <= img.height:
+            return Image.fromarray(np.ascontiguousarray(dxt.crop(img, box, rotation)))
+        img = Image.open(io.BytesIO(img.data))
+    return img.crop(box).rotate(-90 * rotation, expand=True)
+
+def parse_config(file, name, image_config):
+    # info.csv rows of the sprite lines of an entry config
+    rows = []
+    for line in image_config.split('\r\n'):
+        row = parse_line(file, name, line)
+        if row is not None:
+            rows.append(row)
+    return rows
+
+def crop_images(rows, img):
+    # yields (row, image, shadow image or None) for every sprite row of an entry
+    for row in rows:
+        yield crop_row(row, img)
+
+def crop_row(row, img):
+    img_crop = __crop(img[row.atlas], (row.x, row.y, row.x+row.width, row.y+row.height), row.rotation)
+
+    img_shadow_crop = None
+    if row.has_shadow == 1:
+        img_shadow_crop = __crop(img[row.shadow_atlas], (row.shadow_x, row.shadow_y, row.shadow_x+row.shadow_width, row.shadow_y+row.shadow_height), row.shadow_rotation)
+
+    return row, img_crop, img_shadow_crop
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2024 Laserlicht
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import os
+import json
+import hashlib
+
+# fingerprints.json next to a content.zip: the members written per source group (a bitmap pak
+# entry or a def) and a fingerprint of what they were built from. Fingerprints are computed from
+# the pak directories and the sprite index only, so a mod can be checked without decoding images.
+# The inputs fingerprint hashes the stored chunks of the pak entry as well, a rebuild copies the
+# members of a group only if both are unchanged.
+#   {"version": 1,
+#    "options": {build options},
+#    "groups": {"<pak file>/<entry>": {"fingerprint": ..., "inputs": ..., "members": [...]}}}
+# The fingerprints are None if the source entry is unknown (e.g. extracted by an older version),
+# the inputs fingerprint also if the mod was built without incremental.
+
+FILE = "fingerprints.json"
+__VERSION = 1
+
+def bitmap_fingerprint(source, scale):
+    # source: directory fingerprint of the pak entry
+    if source is None:
+        return None
+    return hashlib.blake2b(repr((source, scale)).encode(), digest_size=16).hexdigest()
+
+def def_fingerprint(source, scale, plan):
+    # source: directory fingerprint of the pak entry, plan: plan.DefPlan of the def. Files are
+    # hashed as a set, a folder lists them in another order than the pak and each of them once.
+    if source is None:
+        return None
+    key = (source, scale, plan.width, plan.height, sorted(plan.positions.items()), sorted(plan.flags.items()),
+           sorted(set(plan.outlines)), sorted(set(plan.files)), [tuple(x) for x in plan.animation])
+    return hashlib.blake2b(repr(key).encode(), digest_size=16).hexdigest()
+
+def load_fingerprints(folder):
+    # (options, groups) of a mod folder or None
+    try:
+        with open(os.path.join(folder, FILE)) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if data.get("version") != __VERSION:
+        return None
+    return data["options"], data["groups"]
+
+def save_fingerprints(folder, options, groups):
+    file = os.path.join(folder, FILE)
+    with open(file + ".tmp", "w") as f:
+        groups = {x: {"fingerprint": y["fingerprint"], "inputs": y.get("inputs"), "members": sorted(y["members"])} for x, y in sorted(groups.items())}
+        json.dump({"version": __VERSION, "options": options, "groups": groups}, f, indent=1)
+    os.replace(file + ".tmp", file)
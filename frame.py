@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2024 Laserlicht
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import io
+import hashlib
+from PIL import Image
+
+class Frame:
+    # image file content that is decoded at most once and png encoded once when it is written.
+    # Frames that are never modified keep their original png bytes.
+    def __init__(self, content):
+        self.__png = None
+        self.__image = None
+        self.__digest = None
+        if isinstance(content, Image.Image):
+            self.__image = content
+        else:
+            self.__png = content
+
+    @property
+    def image(self):
+        if self.__image is None:
+            self.__image = Image.open(io.BytesIO(self.__png))
+            self.__image.load()
+        return self.__image
+
+    @image.setter
+    def image(self, img):
+        self.__image = img
+        self.__png = None
+        self.__digest = None
+
+    def png(self, **params):
+        # params: PIL png save options (compress_level, optimize)
+        if self.__png is None:
+            img_byte_arr = io.BytesIO()
+            self.__image.save(img_byte_arr, format='PNG', **params)
+            self.__png = img_byte_arr.getvalue()
+        return self.__png
+
+    def memory(self):
+        # estimated bytes held by the frame
+        ret = 0 if self.__png is None else len(self.__png)
+        if self.__image is not None:
+            ret += self.__image.width * self.__image.height * len(self.__image.getbands())
+        return ret
+
+    def digest(self):
+        # hash of the pixels, equal for identical images whether they were decoded or drawn
+        if self.__digest is None:
+            img = self.image
+            h = hashlib.blake2b(digest_size=16)
+            h.update(repr((img.mode, img.size)).encode())
+            h.update(img.tobytes())
+            self.__digest = h.hexdigest()
+        return self.__digest
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2024 Laserlicht
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import os
+import re
+import sys
+import json
+import time
+import heapq
+import cProfile
+import threading
+import contextlib
+
+# Instrumentation hook of extract_assets and create_mod: time per stage, counters and time per
+# item (pak entry or def). Stages can overlap (png encoding runs on the archive threads), so their
+# times add up to more than the wall time. The slowest items can be profiled with cProfile.
+#
+#   stats = Stats(profile=5)
+#   extract_assets(game, tmp, stats=stats)
+#   create_mod(tmp, out, ["2", "3"], stats=stats)
+#   stats.write("report.json") # and report-<kind>-<item>.prof for the 5 slowest items
+
+class Stats:
+    def __init__(self, profile=0):
+        # profile: number of slowest items to keep a cProfile dump of
+        self.profile = profile
+        self.stages = {} # name -> [seconds, calls]
+        self.counters = {}
+        self.items = {} # kind -> {item name: seconds}
+        self.__profiles = [] # heap of (seconds, kind, name, profile)
+        self.__lock = threading.Lock()
+        self.__start = time.perf_counter()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name, seconds, calls=1):
+        with self.__lock:
+            stage = self.stages.setdefault(name, [0.0, 0])
+            stage[0] += seconds
+            stage[1] += calls
+
+    def count(self, name, value=1):
+        with self.__lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def timed(self, name, func):
+        # func wrapped as a stage, for work that runs on other threads
+        def run(*args, **kwargs):
+            with self.stage(name):
+                return func(*args, **kwargs)
+        return run
+
+    def iterate(self, name, iterable):
+        # yields the items of iterable, the time to produce them is added to a stage
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self.add(name, time.perf_counter() - start)
+            yield item
+
+    @contextlib.contextmanager
+    def item(self, kind, name):
+        profile = cProfile.Profile() if self.profile > 0 else None
+        start = time.perf_counter()
+        if profile is not None:
+            profile.enable()
+        try:
+            yield
+        finally:
+            if profile is not None:
+                profile.disable()
+            seconds = time.perf_counter() - start
+            with self.__lock:
+                self.items.setdefault(kind, {})[name] = self.items.get(kind, {}).get(name, 0.0) + seconds
+                if profile is not None:
+                    heapq.heappush(self.__profiles, (seconds, kind, name, profile))
+                    if len(self.__profiles) > self.profile:
+                        heapq.heappop(self.__profiles)
+
+    def merge(self, report):
+        # adds the report() of another Stats, e.g. of a worker process
+        for name, stage in report["stages"].items():
+            self.add(name, stage["seconds"], stage["calls"])
+        for name, value in report["counters"].items():
+            self.count(name, value)
+        with self.__lock:
+            for kind, items in report["items"].items():
+                for name, seconds in items.items():
+                    self.items.setdefault(kind, {})[name] = self.items.get(kind, {}).get(name, 0.0) + seconds
+
+    def report(self):
+        with self.__lock:
+            return {
+                "seconds": round(time.perf_counter() - self.__start, 6),
+                "stages": {x: {"seconds": round(y[0], 6), "calls": y[1]} for x, y in sorted(self.stages.items(), key=lambda x: -x[1][0])},
+                "counters": dict(sorted(self.counters.items())),
+                "peak_rss": peak_rss(),
+                "items": {x: dict(sorted(((z, round(w, 6)) for z, w in y.items()), key=lambda x: -x[1])) for x, y in self.items.items()}
+            }
+
+    def write(self, file):
+        # json report, cProfile dumps next to it as <file>-<kind>-<item>.prof (readable with pstats)
+        report = self.report()
+        report["profiles"] = {}
+        for seconds, kind, name, profile in sorted(self.__profiles, key=lambda x: -x[0]):
+            dump = os.path.splitext(file)[0] + "-" + kind + "-" + re.sub(r"[^\w.-]", "_", name) + ".prof"
+            profile.dump_stats(dump)
+            report["profiles"][kind + "/" + name] = os.path.basename(dump)
+        with open(file, "w") as f:
+            json.dump(report, f, indent=4)
+
+def peak_rss():
+    # peak resident memory in bytes of this process or of a finished worker process, whichever is
+    # higher. None where the resource module is missing (windows).
+    try:
+        import resource
+    except ImportError:
+        return None
+    unit = 1 if sys.platform == "darwin" else 1024
+    return unit * max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+
+class NullStats:
+    # stand in when no instrumentation is wanted
+    def stage(self, name):
+        return contextlib.nullcontext()
+
+    def add(self, name, seconds, calls=1):
+        pass
+
+    def count(self, name, value=1):
+        pass
+
+    def timed(self, name, func):
+        return func
+
+    def iterate(self, name, iterable):
+        return iterable
+
+    def item(self, kind, name):
+        return contextlib.nullcontext()
+
+    def merge(self, report):
+        pass
+
+NO_STATS = NullStats()
@@ -23,28 +23,38 @@
 # SOFTWARE.
 
 import sys
+import threading
 from pathlib import Path
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                             QPushButton, QProgressBar, QFileDialog, QLabel)
 from PyQt6.QtCore import QTimer, Qt, QThread, pyqtSignal
 from extract import extract_assets
 from create_mod import create_mod
+from progress import Cancelled
 
 class ExtractorThread(QThread):
     finished = pyqtSignal()
     error = pyqtSignal(str)
+    progress = pyqtSignal(object)
+    cancelled = pyqtSignal()
     
     def __init__(self, input_path, temp_path, output_path):
         super().__init__()
         self.input_path = input_path
         self.temp_path = temp_path
         self.output_path = output_path
+        self.cancel = threading.Event()
         
     def run(self):
         try:
-            extract_assets(self.input_path, self.temp_path)
-            create_mod(self.temp_path, self.output_path)
+            if self.temp_path:
+                extract_assets(self.input_path, self.temp_path, progress=self.progress.emit, cancel=self.cancel)
+                create_mod(self.temp_path, self.output_path, ["2", "3"], progress=self.progress.emit, cancel=self.cancel)
+            else:
+                create_mod(self.input_path, self.output_path, ["2", "3"], stream=True, progress=self.progress.emit, cancel=self.cancel)
             self.finished.emit()
+        except Cancelled:
+            self.cancelled.emit()
         except Exception as e:
             self.error.emit(str(e))
 
@@ -55,7 +65,7 @@ class HOMM3Extractor(QMainWindow):
         
     def initUI(self):
         self.setWindowTitle('HOMM3 Asset Extractor')
-        self.setFixedSize(500, 300)
+        self.setFixedSize(500, 360)
         
         # Central widget
         central_widget = QWidget()
@@ -64,7 +74,7 @@ class HOMM3Extractor(QMainWindow):
         
         # Labels to show selected paths
         self.input_label = QLabel('Input folder: Not selected')
-        self.temp_label = QLabel('Temporary folder: Not selected')
+        self.temp_label = QLabel('Temporary folder: Not selected (optional)')
         self.output_label = QLabel('Output folder: Not selected')
         
         # Directory selection buttons
@@ -82,12 +92,21 @@ class HOMM3Extractor(QMainWindow):
         self.extract_btn.clicked.connect(self.start_extraction)
         self.extract_btn.setEnabled(False)
         
+        # Cancel button
+        self.cancel_btn = QPushButton('Cancel', self)
+        self.cancel_btn.clicked.connect(self.cancel_extraction)
+        self.cancel_btn.hide()
+        
         # Progress bar
         self.progress_bar = QProgressBar(self)
         self.progress_bar.setTextVisible(False)
-        self.progress_bar.setRange(0, 0)  # Indeterminate mode
+        self.progress_bar.setRange(0, 0)  # Indeterminate mode until the first progress event
         self.progress_bar.hide()  # Initially hidden
         
+        # Stage, percentage, speed and remaining time
+        self.status_label = QLabel('')
+        self.status_label.hide()
+        
         # Timer for progress bar animation
         self.timer = QTimer()
         self.timer.timeout.connect(self.update_progress)
@@ -101,7 +120,9 @@ class HOMM3Extractor(QMainWindow):
         layout.addWidget(output_btn)
         layout.addSpacing(20)
         layout.addWidget(self.extract_btn)
+        layout.addWidget(self.cancel_btn)
         layout.addWidget(self.progress_bar)
+        layout.addWidget(self.status_label)
         
         # Initialize path variables
         self.input_path = None
@@ -122,8 +143,8 @@ class HOMM3Extractor(QMainWindow):
                 self.output_path = folder
                 self.output_label.setText(f'Output folder: {folder}')
                 
-        # Enable extract button only if all paths are selected
-        if all([self.input_path, self.temp_path, self.output_path]):
+        # Enable extract button once input and output are selected, the temporary folder is optional
+        if all([self.input_path, self.output_path]):
             self.extract_btn.setEnabled(True)
     
     def update_progress(self):
@@ -131,34 +152,65 @@ class HOMM3Extractor(QMainWindow):
         # to do anything here, animation is automatic
         pass
     
+    def show_progress(self, event):
+        stages = {'extract': 'Extracting', 'create_mod': 'Creating mod'}
+        self.progress_bar.setRange(0, max(event.total, 1))
+        self.progress_bar.setValue(event.done)
+        text = f'{stages.get(event.stage, event.stage)}: {event.done * 100 // max(event.total, 1)}% ({event.done}/{event.total}), {event.rate:.1f} items/s'
+        if event.eta is not None:
+            text += f', {int(event.eta) // 60}:{int(event.eta) % 60:02d} left'
+        self.status_label.setText(text)
+    
+    def reset_controls(self):
+        self.progress_bar.hide()
+        self.status_label.hide()
+        self.cancel_btn.hide()
+        self.extract_btn.setEnabled(True)
+        self.extract_btn.setText('Start Extraction')
+    
     def extraction_completed(self):
         self.progress_bar.setRange(0, 100)  # Back to determinate mode
         self.progress_bar.setValue(100)
-        self.extract_btn.setEnabled(True)
-        self.extract_btn.setText('Start Extraction')
+        self.reset_controls()
         
         from PyQt6.QtWidgets import QMessageBox
         QMessageBox.information(self, 'Success', 'Assets extracted and mod successfully created!')
+    
+    def extraction_cancelled(self):
+        self.reset_controls()
         
-        self.progress_bar.hide()
+        from PyQt6.QtWidgets import QMessageBox
+        QMessageBox.information(self, 'Cancelled', 'Extraction cancelled, the output folders were left as before.')
     
     def extraction_error(self, error):
-        self.progress_bar.hide()
-        self.extract_btn.setEnabled(True)
-        self.extract_btn.setText('Start Extraction')
+        self.reset_controls()
         
         from PyQt6.QtWidgets import QMessageBox
         QMessageBox.critical(self, 'Error', f'An error occurred during extraction:\n{error}')
     
+    def cancel_extraction(self):
+        if self.thread is not None:
+            self.thread.cancel.set()
+        self.cancel_btn.setEnabled(False)
+        self.cancel_btn.setText('Cancelling...')
+    
     def start_extraction(self):
         self.extract_btn.setEnabled(False)
         self.extract_btn.setText('Extracting...')
+        self.cancel_btn.setEnabled(True)
+        self.cancel_btn.setText('Cancel')
+        self.cancel_btn.show()
+        self.progress_bar.setRange(0, 0)
         self.progress_bar.show()
+        self.status_label.setText('')
+        self.status_label.show()
         
         # Create and start extraction thread
         self.thread = ExtractorThread(self.input_path, self.temp_path, self.output_path)
         self.thread.finished.connect(self.extraction_completed)
         self.thread.error.connect(self.extraction_error)
+        self.thread.progress.connect(self.show_progress)
+        self.thread.cancelled.connect(self.extraction_cancelled)
         self.thread.start()
 
 def main():
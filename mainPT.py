@@ -26,28 +26,38 @@
 # encoding: utf-8
 
 import sys
+import threading
 from pathlib import Path
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                             QPushButton, QProgressBar, QFileDialog, QLabel)
 from PyQt6.QtCore import QTimer, Qt, QThread, pyqtSignal
 from extract import extract_assets
 from create_mod import create_mod
+from progress import Cancelled
 
 class ThreadExtrator(QThread):
     finished = pyqtSignal()
     error = pyqtSignal(str)
+    progress = pyqtSignal(object)
+    cancelled = pyqtSignal()
     
     def __init__(self, input_path, temp_path, output_path):
         super().__init__()
         self.input_path = input_path
         self.temp_path = temp_path
         self.output_path = output_path
+        self.cancel = threading.Event()
         
     def run(self):
         try:
-            extract_assets(self.input_path, self.temp_path)
-            create_mod(self.temp_path, self.output_path)
+            if self.temp_path:
+                extract_assets(self.input_path, self.temp_path, progress=self.progress.emit, cancel=self.cancel)
+                create_mod(self.temp_path, self.output_path, ["2", "3"], progress=self.progress.emit, cancel=self.cancel)
+            else:
+                create_mod(self.input_path, self.output_path, ["2", "3"], stream=True, progress=self.progress.emit, cancel=self.cancel)
             self.finished.emit()
+        except Cancelled:
+            self.cancelled.emit()
         except Exception as e:
             self.error.emit(str(e))
 
@@ -58,7 +68,7 @@ class ExtratorHOMM3(QMainWindow):
         
     def initUI(self):
         self.setWindowTitle('Extrator de Assets HOMM3')
-        self.setFixedSize(500, 300)
+        self.setFixedSize(500, 360)
         
         # Widget central
         central_widget = QWidget()
@@ -67,7 +77,7 @@ class ExtratorHOMM3(QMainWindow):
         
         # Labels para mostrar os caminhos selecionados
         self.label_entrada = QLabel('Pasta de entrada: Não selecionada')
-        self.label_temp = QLabel('Pasta temporária: Não selecionada')
+        self.label_temp = QLabel('Pasta temporária: Não selecionada (opcional)')
         self.label_saida = QLabel('Pasta de saída: Não selecionada')
         
         # Botões para selecionar diretórios
@@ -85,12 +95,21 @@ class ExtratorHOMM3(QMainWindow):
         self.btn_extrair.clicked.connect(self.iniciar_extracao)
         self.btn_extrair.setEnabled(False)
         
+        # Botão para cancelar
+        self.btn_cancelar = QPushButton('Cancelar', self)
+        self.btn_cancelar.clicked.connect(self.cancelar_extracao)
+        self.btn_cancelar.hide()
+        
         # Barra de progresso
         self.progress_bar = QProgressBar(self)
         self.progress_bar.setTextVisible(False)
-        self.progress_bar.setRange(0, 0)  # Modo indeterminado
+        self.progress_bar.setRange(0, 0)  # Modo indeterminado até o primeiro evento de progresso
         self.progress_bar.hide()  # Inicialmente escondida
         
+        # Etapa, porcentagem, velocidade e tempo restante
+        self.label_status = QLabel('')
+        self.label_status.hide()
+        
         # Timer para animação da barra de progresso
         self.timer = QTimer()
         self.timer.timeout.connect(self.atualizar_progresso)
@@ -104,7 +123,9 @@ class ExtratorHOMM3(QMainWindow):
         layout.addWidget(btn_saida)
         layout.addSpacing(20)
         layout.addWidget(self.btn_extrair)
+        layout.addWidget(self.btn_cancelar)
         layout.addWidget(self.progress_bar)
+        layout.addWidget(self.label_status)
         
         # Inicializa variáveis para os caminhos
         self.input_path = None
@@ -125,8 +146,8 @@ class ExtratorHOMM3(QMainWindow):
                 self.output_path = pasta
                 self.label_saida.setText(f'Pasta de saída: {pasta}')
                 
-        # Habilita o botão de extração apenas se todos os caminhos estiverem selecionados
-        if all([self.input_path, self.temp_path, self.output_path]):
+        # Habilita o botão de extração com entrada e saída selecionadas, a pasta temporária é opcional
+        if all([self.input_path, self.output_path]):
             self.btn_extrair.setEnabled(True)
     
     def atualizar_progresso(self):
@@ -134,34 +155,65 @@ class ExtratorHOMM3(QMainWindow):
         # fazer nada aqui, a animação é automática
         pass
     
+    def mostrar_progresso(self, evento):
+        etapas = {'extract': 'Extraindo', 'create_mod': 'Criando mod'}
+        self.progress_bar.setRange(0, max(evento.total, 1))
+        self.progress_bar.setValue(evento.done)
+        texto = f'{etapas.get(evento.stage, evento.stage)}: {evento.done * 100 // max(evento.total, 1)}% ({evento.done}/{evento.total}), {evento.rate:.1f} itens/s'
+        if evento.eta is not None:
+            texto += f', faltam {int(evento.eta) // 60}:{int(evento.eta) % 60:02d}'
+        self.label_status.setText(texto)
+    
+    def restaurar_controles(self):
+        self.progress_bar.hide()
+        self.label_status.hide()
+        self.btn_cancelar.hide()
+        self.btn_extrair.setEnabled(True)
+        self.btn_extrair.setText('Iniciar Extração')
+    
     def extracao_concluida(self):
         self.progress_bar.setRange(0, 100)  # Volta para o modo determinado
         self.progress_bar.setValue(100)
-        self.btn_extrair.setEnabled(True)
-        self.btn_extrair.setText('Iniciar Extração')
+        self.restaurar_controles()
         
         from PyQt6.QtWidgets import QMessageBox
         QMessageBox.information(self, 'Sucesso', 'Extração concluída e mod criado com sucesso!')
+    
+    def extracao_cancelada(self):
+        self.restaurar_controles()
         
-        self.progress_bar.hide()
+        from PyQt6.QtWidgets import QMessageBox
+        QMessageBox.information(self, 'Cancelado', 'Extração cancelada, as pastas de saída ficaram como antes.')
     
     def erro_extracao(self, erro):
-        self.progress_bar.hide()
-        self.btn_extrair.setEnabled(True)
-        self.btn_extrair.setText('Iniciar Extração')
+        self.restaurar_controles()
         
         from PyQt6.QtWidgets import QMessageBox
         QMessageBox.critical(self, 'Erro', f'Ocorreu um erro durante a extração:\n{erro}')
     
+    def cancelar_extracao(self):
+        if self.thread is not None:
+            self.thread.cancel.set()
+        self.btn_cancelar.setEnabled(False)
+        self.btn_cancelar.setText('Cancelando...')
+    
     def iniciar_extracao(self):
         self.btn_extrair.setEnabled(False)
         self.btn_extrair.setText('Extraindo...')
+        self.btn_cancelar.setEnabled(True)
+        self.btn_cancelar.setText('Cancelar')
+        self.btn_cancelar.show()
+        self.progress_bar.setRange(0, 0)
         self.progress_bar.show()
+        self.label_status.setText('')
+        self.label_status.show()
         
         # Cria e inicia a thread de extração
         self.thread = ThreadExtrator(self.input_path, self.temp_path, self.output_path)
         self.thread.finished.connect(self.extracao_concluida)
         self.thread.error.connect(self.erro_extracao)
+        self.thread.progress.connect(self.mostrar_progresso)
+        self.thread.cancelled.connect(self.extracao_cancelada)
         self.thread.start()
 
 def main():
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2024 Laserlicht
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import os
+from collections import namedtuple
+
+# info.csv: one row per sprite line of the pak entry configs, ';' separated, no header.
+# The shadow columns are only present if has_shadow is 1.
+ManifestRow = namedtuple('ManifestRow', [
+    'pak',              # pak file name
+    'entry',            # pak entry (def folder) name
+    'image',            # image name
+    'atlas',            # index of the dds image of the entry
+    'offset_x',         # x offset between hd and sd sprites
+    'val2',
+    'offset_y',         # y offset between hd and sd sprites
+    'val4',
+    'x', 'y', 'width', 'height', 'rotation', # crop rectangle in the atlas, rotation in 90 degree steps
+    'has_shadow',
+    'shadow_atlas',
+    'shadow_x', 'shadow_y', 'shadow_width', 'shadow_height', 'shadow_rotation'
+])
+
+COLUMNS = len(ManifestRow._fields)
+__SPRITE_COLUMNS = 12 # without the shadow columns
+
+def parse_line(pak, entry, line):
+    # row of a sprite line of an entry config (space separated) or None for other lines
+    tmp = line.split(' ')
+    if len(tmp) <= 11:
+        return None
+    return __row([pak, entry] + tmp)
+
+def __row(fields):
+    values = [None if x == "" else int(x) for x in fields[3:COLUMNS]]
+    values += [None] * (COLUMNS - 3 - len(values))
+    return ManifestRow(fields[0], fields[1], fields[2], *values)
+
+def format_row(row):
+    fields = row if row.has_shadow == 1 else row[:__SPRITE_COLUMNS + 2]
+    return ";".join("" if x is None else str(x) for x in fields) + "\r\n"
+
+def read_manifest(file):
+    # file: path or text file object
+    if isinstance(file, (str, os.PathLike)):
+        with open(file, newline="") as f:
+            return read_manifest(f)
+    rows = []
+    for line in file.read().split("\n"):
+        line = line.rstrip("\r")
+        if line != "":
+            rows.append(__row(line.split(";")))
+    return rows
+
+class ManifestWriter:
+    # collects rows and writes them in large blocks
+    def __init__(self, file, buffer_size=1 << 20):
+        self.__f = open(file, "w", newline="")
+        self.__buffer = []
+        self.__buffered = 0
+        self.__buffer_size = buffer_size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def write(self, rows):
+        for row in rows:
+            line = format_row(row)
+            self.__buffer.append(line)
+            self.__buffered += len(line)
+        if self.__buffered >= self.__buffer_size:
+            self.flush()
+
+    def flush(self):
+        self.__f.write("".join(self.__buffer))
+        self.__buffer = []
+        self.__buffered = 0
+
+    def close(self):
+        self.flush()
+        self.__f.close()
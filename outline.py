@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2024 Laserlicht
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import numpy as np
+from PIL import Image, ImageFilter, ImageEnhance
+
+# Creature outlines, pixel identical to the PIL chain
+#   alpha = ImageEnhance.Brightness(alpha).enhance(5)
+#   RGBA canvas, paste(alpha, mask=alpha), FIND_EDGES, MaxFilter(3)
+# computed on the alpha channels of all frames of a def at once.
+
+BATCH_PIXELS = 1 << 24 # frames per batch are limited to this many pixels
+
+def outline(img):
+    alpha = img.split()[-1]
+    alpha = ImageEnhance.Brightness(alpha).enhance(5)
+    img = Image.new("RGBA", img.size, (0,0,0,0))
+    img.paste(alpha, mask=alpha)
+    img = img.filter(ImageFilter.FIND_EDGES)
+    img = img.filter(ImageFilter.MaxFilter(3))
+    return img
+
+def outlines(images):
+    # outlines of a list of images, same sized RGBA images are stacked and done in numpy
+    ret = [None] * len(images)
+    groups = {}
+    for i, img in enumerate(images):
+        if img.mode == "RGBA" and img.width >= 3 and img.height >= 3:
+            groups.setdefault(img.size, []).append(i)
+        else:
+            ret[i] = outline(img)
+    for (width, height), items in groups.items():
+        batch = max(1, BATCH_PIXELS // (width * height))
+        for k in range(0, len(items), batch):
+            alpha = np.stack([np.asarray(images[i].getchannel("A")) for i in items[k:k + batch]])
+            for i, rgba in zip(items[k:k + batch], __outlines(alpha)):
+                ret[i] = Image.fromarray(rgba)
+    return ret
+
+def __outlines(alpha):
+    # alpha: frames x height x width uint8
+    brightness = np.minimum(alpha.astype(np.uint16) * 5, 255)
+    # pasting the brightened alpha with itself as mask: grey = brightness * brightness / 255 (PIL rounding)
+    tmp = brightness * brightness + 128
+    grey = ((tmp + (tmp >> 8)) >> 8).astype(np.uint8)
+    brightness = brightness.astype(np.uint8)
+
+    grey = __dilate(__find_edges(grey))
+    brightness = __dilate(__find_edges(brightness))
+
+    rgba = np.empty(alpha.shape + (4,), np.uint8)
+    rgba[..., 0] = grey
+    rgba[..., 1] = grey
+    rgba[..., 2] = grey
+    rgba[..., 3] = brightness
+    return rgba
+
+def __find_edges(band):
+    # 3x3 kernel (-1 ... 8 ... -1), border pixels are copied like in PIL
+    x = band.astype(np.int16)
+    neighbours = x[:, :-2, :-2] + x[:, :-2, 1:-1] + x[:, :-2, 2:] + \
+        x[:, 1:-1, :-2] + x[:, 1:-1, 2:] + \
+        x[:, 2:, :-2] + x[:, 2:, 1:-1] + x[:, 2:, 2:]
+    ret = band.copy()
+    ret[:, 1:-1, 1:-1] = np.clip(8 * x[:, 1:-1, 1:-1] - neighbours, 0, 255)
+    return ret
+
+def __dilate(band):
+    # 3x3 max filter, the image border is extended like in PIL
+    height, width = band.shape[1:]
+    x = np.pad(band, ((0, 0), (1, 1), (1, 1)), mode="edge")
+    ret = x[:, 1:-1, 1:-1].copy()
+    for dy in range(3):
+        for dx in range(3):
+            np.maximum(ret, x[:, dy:dy + height, dx:dx + width], out=ret)
+    return ret
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2024 Laserlicht
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+import sys
+import mmap
+import zlib
+import struct
+import hashlib
+from array import array
+
+# pak layout:
+#   header:    4 byte dummy, 4 byte info_offset
+#   directory: at info_offset, 4 byte file count, then per file:
+#              8 byte name, 12 byte dummy, offset, config size, chunks, zsize, size,
+#              chunks * chunk zsize, chunks * chunk size
+#   payload:   at offset, config text followed by the (zlib compressed) chunks
+_ENTRY = struct.Struct('<8s12x5I')
+_DDS = b'DDS '
+
+def find_paks(data_dir, langs=None):
+    # (pak file, language) in extraction order: per scale the com paks, then the loc paks of every
+    # language in data/LOC (or of the given languages)
+    loc = os.path.join(data_dir, 'LOC')
+    languages = sorted(os.listdir(loc)) if os.path.isdir(loc) else []
+    if langs is not None:
+        languages = [x for x in languages if x in langs]
+    paks = []
+    for scale in ["2", "3"]:
+        for filename in os.listdir(data_dir):
+            if filename.lower().endswith(".pak") and "x" + scale in filename:
+                full_name = os.path.join(data_dir, filename)
+                paks.append((full_name, ""))
+        for lang in languages:
+            for filename in os.listdir(os.path.join(loc, lang)):
+                if filename.lower().endswith(".pak") and "x" + scale in filename:
+                    full_name = os.path.join(loc, lang, filename)
+                    paks.append((full_name, lang))
+    return paks
+
+class PakArchive:
+    def __init__(self, file):
+        self.file = file
+        self.__f = open(file, 'rb')
+        self.__map = mmap.mmap(self.__f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.__view = memoryview(self.__map)
+
+        self.names = []
+        self.offsets = array('I')
+        self.config_sizes = array('I')
+        self.chunk_counts = array('I')
+        self.zsizes = array('I')
+        self.sizes = array('I')
+        self.chunk_starts = array('I') # index of the first chunk of an entry in chunk_zsizes/chunk_sizes
+        self.chunk_zsizes = array('I')
+        self.chunk_sizes = array('I')
+        self.__parse()
+        self.__lookup = {x.upper(): i for i, x in enumerate(self.names)}
+
+    def __parse(self):
+        view = self.__view
+        info_offset = int.from_bytes(view[4:8], byteorder='little')
+        files = int.from_bytes(view[info_offset:info_offset + 4], byteorder='little')
+        pos = info_offset + 4
+        for i in range(files):
+            name, offset, config_size, chunks, zsize, size = _ENTRY.unpack_from(view, pos)
+            pos += _ENTRY.size
+            self.names.append(name.split(b'\0', 1)[0].decode())
+            self.offsets.append(offset)
+            self.config_sizes.append(config_size)
+            self.chunk_counts.append(chunks)
+            self.zsizes.append(zsize)
+            self.sizes.append(size)
+            self.chunk_starts.append(len(self.chunk_zsizes))
+            self.chunk_zsizes.frombytes(view[pos:pos + 4 * chunks])
+            pos += 4 * chunks
+            self.chunk_sizes.frombytes(view[pos:pos + 4 * chunks])
+            pos += 4 * chunks
+        if sys.byteorder != 'little':
+            self.chunk_zsizes.byteswap()
+            self.chunk_sizes.byteswap()
+
+    def __len__(self):
+        return len(self.names)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        try:
+            self.__view.release()
+            self.__map.close()
+        except BufferError:
+            pass # payload views are still alive, the map is freed together with them
+        self.__f.close()
+
+    def find(self, name):
+        # index of an entry by its (case insensitive) name or None
+        return self.__lookup.get(name.upper())
+
+    def config(self, i):
+        offset = self.offsets[i]
+        return bytes(self.__view[offset:offset + self.config_sizes[i]]).decode()
+
+    def payload(self, i):
+        # stored (possibly compressed) chunk bytes of an entry without copying
+        offset = self.offsets[i] + self.config_sizes[i]
+        return self.__view[offset:offset + self.zsizes[i]]
+
+    def chunks(self, i):
+        offset = self.offsets[i] + self.config_sizes[i]
+        start = self.chunk_starts[i]
+        ret = []
+        for j in range(start, start + self.chunk_counts[i]):
+            ret.append(self.__view[offset:offset + self.chunk_zsizes[j]])
+            offset += self.chunk_zsizes[j]
+        return ret
+
+    def is_compressed(self, i, j):
+        j += self.chunk_starts[i]
+        return self.chunk_zsizes[j] != self.chunk_sizes[j]
+
+    def fingerprint(self, i):
+        # hash of the sizes, config and stored chunk bytes of an entry. The offset is left out on
+        # purpose, a patch that rewrites the pak moves entries without changing them.
+        start = self.chunk_starts[i]
+        h = hashlib.blake2b(digest_size=16)
+        h.update(struct.pack('<3I', self.config_sizes[i], self.zsizes[i], self.sizes[i]))
+        h.update(self.chunk_zsizes[start:start + self.chunk_counts[i]].tobytes())
+        h.update(self.chunk_sizes[start:start + self.chunk_counts[i]].tobytes())
+        offset = self.offsets[i]
+        h.update(self.__view[offset:offset + self.config_sizes[i] + self.zsizes[i]])
+        return h.hexdigest()
+
+    def directory_fingerprint(self, i):
+        # hash of the sizes and config of an entry, without reading the chunks. Cheap enough to
+        # check a whole pak against fingerprints stored by an earlier run.
+        start = self.chunk_starts[i]
+        h = hashlib.blake2b(digest_size=16)
+        h.update(struct.pack('<3I', self.config_sizes[i], self.zsizes[i], self.sizes[i]))
+        h.update(self.chunk_zsizes[start:start + self.chunk_counts[i]].tobytes())
+        h.update(self.chunk_sizes[start:start + self.chunk_counts[i]].tobytes())
+        offset = self.offsets[i]
+        h.update(self.__view[offset:offset + self.config_sizes[i]])
+        return h.hexdigest()
+
+    def read(self, i, executor=None):
+        # list of the dds images of an entry. A raw image in one chunk is a view into the pak, compressed
+        # chunks are inflated into a buffer of their known size, concurrently if an executor is given.
+        chunks = self.chunks(i)
+        start = self.chunk_starts[i]
+        sizes = [self.chunk_sizes[start + j] if self.is_compressed(i, j) else None for j in range(len(chunks))]
+        inflate = executor.map if executor is not None and len(chunks) > 1 else map
+        data = list(inflate(_inflate, chunks, sizes))
+
+        ret = []
+        j = 0
+        while j < len(chunks):
+            if sizes[j] is None:
+                # an uncompressed image continues in the following raw chunks up to the next dds header
+                k = j + 1
+                while k < len(chunks) and sizes[k] is None and bytes(chunks[k][:4]) != _DDS:
+                    k += 1
+                ret.append(chunks[j] if k == j + 1 else b''.join(chunks[j:k]))
+                j = k
+            elif data[j] is not None:
+                ret.append(data[j])
+                j += 1
+            else:
+                # several streams in one chunk or a stream continued in the next chunk
+                streams, j = _inflate_streams(chunks, j)
+                ret += streams
+        return ret
+
+def _inflate(chunk, size):
+    # a chunk holding exactly one stream or None, size is None for raw chunks
+    if size is None:
+        return chunk
+    try:
+        data = zlib.decompress(chunk, bufsize=size)
+    except zlib.error:
+        return None
+    return data if len(data) == size else None
+
+def _inflate_streams(chunks, j):
+    # inflates the streams starting at chunk j until one ends at a chunk boundary,
+    # returns the streams and the next chunk
+    ret = []
+    out = []
+    dec = zlib.decompressobj()
+    while j < len(chunks):
+        view = chunks[j]
+        j += 1
+        try:
+            out.append(dec.decompress(view))
+            while dec.eof:
+                ret.append(b''.join(out))
+                out = []
+                view = view[len(view) - len(dec.unused_data):]
+                dec = zlib.decompressobj()
+                if len(view) == 0:
+                    return ret, j
+                out.append(dec.decompress(view))
+        except zlib.error:
+            break
+    if len(out) > 0:
+        ret.append(b''.join(out))
+    return ret, j
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2024 Laserlicht
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import os
+from collections import namedtuple
+
+# Work plan of a def folder, joined up front from the sprite index and the file names of the folder:
+#   width, height: canvas size of the def in sd pixels
+#   positions:     file -> paste position on the canvas in sd pixels (sd margin minus hd offset)
+#   flags:         file -> spriteFlagsInfo.txt row, written as <name>-overlay.png
+#   outlines:      files getting a creature outline, written as <name>-overlay.png
+#   files:         all files of the def in archive order, including the overlays
+#   animation:     sprite rows listed in the animation config
+DefPlan = namedtuple('DefPlan', 'folder width height positions flags outlines files animation')
+
+# skip menu buttons (RoE)
+# skip dialogbox - coloring not supported yet by vcmi
+# skip water + rivers special handling - paletteAnimation - not supported yet by vcmi
+SKIPPED_DEFS = ["MMENUNG", "MMENULG", "MMENUHS", "MMENUCR", "MMENUQT", "GTSINGL", "GTMULTI", "GTCAMPN", "GTTUTOR", "GTBACK"] + \
+    ["dialgbox"] + \
+    ["WATRTL", "LAVATL"] + ["CLRRVR", "MUDRVR", "LAVRVR"]
+
+CREATURES = tuple(x.upper() for x in ["CABEHE", "CADEVL", "CAELEM", "CALIZA", "CAMAGE", "cangel", "CAPEGS", "CBASIL", "CBDRGN", "CBDWAR", "cbehol", "Cbgog", "CBKNIG", "CBLORD", "CBTREE", "CBWLFR", "CCAVLR", "CCENTR", "CCERBU", "Ccgorg", "CCHAMP", "cchydr", "CCMCOR", "Ccrusd", "CcyclLor", "CCYCLR", "CDDRAG", "CDEVIL", "CDGOLE", "CDRFIR", "CDRFLY", "CDWARF", "CECENT", "CEELEM", "cefree", "cefres", "CELF", "Ceveye", "CFAMIL", "CFELEM", "CGARGO", "CGBASI", "CGDRAG", "CGENIE", "CGGOLE", "CGNOLL", "CGNOLM", "CGOBLI", "CGOG", "CGRELF", "CGREMA", "CGREMM", "CGRIFF", "CGTITA", "chalbd", "CHARPH", "CHARPY", "CHCBOW", "CHDRGN", "CHGOBL", "CHHOUN", "CHYDRA", "CIGOLE", "CIMP", "Citrog", "CLCBOW", "CLICH", "CLTITA", "CMAGE", "CMAGOG", "CMCORE", "Cmeduq", "Cmedus", "Cminok", "CMINOT", "Cmonkk", "CNAGA", "CNAGAG", "CNDRGN", "CNOSFE", "COGARG", "COGMAG", "COGRE", "COHDEM", "CORCCH", "CORC", "CPEGAS", "CPFIEN", "CPFOE", "CPKMAN", "CPLICH", "CPLIZA", "CRANGL", "CRDRGN", "Crgrif", "CROC", "CSGOLE", "CSKELE", "CSULTA", "Csword", "CTBIRD", "CTHDEM", "CTREE", "Ctrogl", "CUNICO", "CUWLFR", "CVAMP", "CWELEM", "CWIGHT", "CWRAIT", "CWSKEL", "CWUNIC", "CWYVER", "CWYVMN", "CYBEHE", "Czealt", "CZOMBI", "CZOMLO"])
+
+def plan_sprites(index, source, pak, lang, cache=None):
+    # plans of all defs of a sprite pak, in the order of the sprite index
+    # cache: dict shared between calls, defs with the same files are planned once (e.g. for all scales)
+    cache = {} if cache is None else cache
+    folders = {}
+    for x in source.sprite_folders(pak, lang):
+        folders.setdefault(x.upper(), x)
+
+    plans = []
+    for defname in index.defnames():
+        folder = folders.get(defname.upper())
+        if folder is None or folder.upper() in SKIPPED_DEFS:
+            continue
+        files = tuple(source.sprite_files(pak, lang, folder))
+        key = (defname, folder, files)
+        if key not in cache:
+            cache[key] = plan_def(index, defname, folder, files)
+        plans.append(cache[key])
+    return plans
+
+def plan_def(index, defname, folder, files):
+    sprites = index.sprites(defname)
+    sprite_rows = {}
+    for x in sprites:
+        sprite_rows.setdefault(x.imagename.upper(), x)
+    info_rows = {}
+    for x in index.info(folder):
+        info_rows.setdefault(x.image.upper(), x)
+
+    files = list(files)
+    positions = {}
+    for file in files:
+        name = os.path.splitext(file.replace(".shadow", ""))[0].upper()
+        if name in sprite_rows:
+            sprite, info = sprite_rows[name], info_rows[name]
+            positions[file] = (sprite.left_margin - info.offset_x, sprite.top_margin - info.offset_y)
+
+    flags = {}
+    for file in files:
+        flag = index.flag(os.path.splitext(file)[0])
+        if flag is not None:
+            flags[file] = flag
+    files += [x for x in dict.fromkeys(os.path.splitext(x)[0] + "-overlay.png" for x in flags) if x not in files]
+
+    outlines = []
+    for file in files:
+        name = os.path.splitext(file)[0].upper()
+        if name.startswith(CREATURES) and "SHADOW" not in name:
+            outlines.append(file)
+    files += [x for x in dict.fromkeys(os.path.splitext(x)[0] + "-overlay.png" for x in outlines) if x not in files]
+
+    names = set(os.path.splitext(x)[0].upper() for x in files)
+    animation = [x for x in sprites if x.imagename.upper() in names]
+
+    return DefPlan(
+        folder,
+        max(x.full_width for x in sprites),
+        max(x.full_height for x in sprites),
+        positions,
+        flags,
+        outlines,
+        files,
+        animation
+    )
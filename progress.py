@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2024 Laserlicht
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import time
+from collections import namedtuple
+
+# Progress events and cancellation of extract_assets and create_mod. The callback gets a
+# ProgressEvent per finished item (pak entry, bitmap or def), at most every interval seconds
+# and always for the last item of a stage. Setting the cancel event (threading.Event) makes the
+# next check raise Cancelled; outputs are left as they were before the run or complete.
+ProgressEvent = namedtuple('ProgressEvent', [
+    'stage',    # "extract" or "create_mod"
+    'done',     # finished items
+    'total',    # items of the stage, known when it starts
+    'rate',     # items per second
+    'eta'       # estimated seconds left or None
+])
+
+class Cancelled(Exception):
+    pass
+
+class Progress:
+    def __init__(self, callback=None, cancel=None, interval=0.1):
+        self.callback = callback
+        self.cancel = cancel
+        self.interval = interval
+        self.stage = None
+        self.done = 0
+        self.total = 0
+        self.__start = 0
+        self.__last = 0
+
+    def start(self, stage, total):
+        self.check()
+        self.stage, self.done, self.total = stage, 0, total
+        self.__start = self.__last = time.perf_counter()
+        self.__emit(self.__start)
+
+    def advance(self, count=1):
+        self.done += count
+        now = time.perf_counter()
+        if now - self.__last >= self.interval or self.done >= self.total:
+            self.__last = now
+            self.__emit(now)
+        self.check()
+
+    def check(self):
+        if self.cancel is not None and self.cancel.is_set():
+            raise Cancelled()
+
+    def __emit(self, now):
+        if self.callback is None:
+            return
+        elapsed = now - self.__start
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        eta = (self.total - self.done) / rate if rate > 0 else None
+        self.callback(ProgressEvent(self.stage, self.done, self.total, rate, eta))
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2024 Laserlicht
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import os
+import fnmatch
+
+# Include and exclude patterns for pak entries, def folders and bitmaps. Patterns are case
+# insensitive globs, a pattern with a '/' is matched against "<pak file>/<name>", others
+# against the name alone, e.g. "CABEHE", "C*" or "bitmap_DXT_loc_x?.pak/*". Bitmaps are selected
+# by image name, in extract_assets through the bitmap pak entry holding them.
+# Without include patterns everything not excluded is selected.
+
+class Selection:
+    def __init__(self, include=None, exclude=None):
+        self.include = [x.upper() for x in include or []]
+        self.exclude = [x.upper() for x in exclude or []]
+
+    def __bool__(self):
+        # whether anything is filtered out
+        return len(self.include) > 0 or len(self.exclude) > 0
+
+    def match(self, pak, name):
+        name = name.upper()
+        path = pak.upper() + "/" + name
+        if len(self.include) > 0 and not any(_match(x, name, path) for x in self.include):
+            return False
+        return not any(_match(x, name, path) for x in self.exclude)
+
+    def indices(self, archive):
+        # selected entries of a PakArchive. Plain names are looked up in the directory, only
+        # wildcard patterns go through all entry names. An entry of a bitmap pak is also selected
+        # if one of its images is, create_mod selects bitmaps by their image names.
+        pak = os.path.basename(archive.file)
+        images = pak.upper().startswith("BITMAP_")
+        if len(self.include) > 0 and not images and not any(_is_glob(x) for x in self.include):
+            found = set()
+            for x in self.include:
+                if "/" in x:
+                    x_pak, x = x.rsplit("/", 1)
+                    if x_pak != pak.upper():
+                        continue
+                i = archive.find(x)
+                if i is not None:
+                    found.add(i)
+            candidates = sorted(found)
+        else:
+            candidates = range(len(archive))
+        return [i for i in candidates if self.match(pak, archive.names[i]) or images and any(self.match(pak, x) for x in _images(archive.config(i)))]
+
+def _match(pattern, name, path):
+    return fnmatch.fnmatchcase(path if "/" in pattern else name, pattern)
+
+def _images(config):
+    # image names of the lines of an entry config
+    return [x.split(" ", 1)[0] for x in config.split("\r\n") if len(x) > 0]
+
+def _is_glob(pattern):
+    return any(x in pattern for x in "*?[")
+
+ALL = Selection()
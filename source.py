@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2024 Laserlicht
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import os
+from pak import PakArchive, find_paks
+from extract import decode_images, parse_config, crop_images, extracted_entries
+from store import open_store, key
+
+# create_mod reads the extracted images either from the temporary folder written by
+# extract_assets (FolderSource, loose files or a pack file) or directly from the game paks (PakSource).
+# File contents are png bytes (FolderSource) or images (PakSource).
+
+class FolderSource:
+    def __init__(self, in_folder):
+        self.in_folder = in_folder
+        self.data_path = os.path.join(in_folder, "data")
+        self.index_path = os.path.join(in_folder, "sprites.idx")
+        self.store = open_store(in_folder)
+        self.__entries = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self.store.close()
+
+    def langs(self, scale):
+        return sorted(self.store.listdir("bitmap_DXT_loc_x" + scale + ".pak"))
+
+    def info(self):
+        # info.csv path or rows
+        return os.path.join(self.in_folder, "info.csv")
+
+    def bitmap_files(self, pak, lang):
+        return self.store.listdir(key(pak, lang))
+
+    def bitmaps(self, pak, lang, files=None):
+        # files: only read these files
+        for file in self.store.listdir(key(pak, lang)) if files is None else files:
+            yield file, self.store.read(key(pak, lang, file))
+
+    def sprite_folders(self, pak, lang):
+        return self.store.listdir(key(pak, lang))
+
+    def entries(self, pak, lang):
+        # pak entry -> (directory fingerprint or None, files), as recorded by extract_assets
+        return {x: (record.get("source"), [y.rsplit("/", 1)[-1] for y in record["outputs"]]) for x, record in self.__records(pak, lang)}
+
+    def content(self, pak, lang, entry):
+        # fingerprint of the stored chunks of a pak entry as recorded by extract_assets or None
+        record = self.__cache().get(pak + "/" + lang + "/" + entry)
+        return None if record is None else record["fingerprint"].split(".")[0]
+
+    def __cache(self):
+        if self.__entries is None:
+            self.__entries = extracted_entries(self.in_folder)
+        return self.__entries
+
+    def __records(self, pak, lang):
+        for x, record in self.__cache().items():
+            x_pak, x_lang, name = x.split("/", 2)
+            if x_pak == pak and x_lang == lang:
+                yield name, record
+
+    def sprite_files(self, pak, lang, folder):
+        return self.store.listdir(key(pak, lang, folder))
+
+    def sprites(self, pak, lang, folder, files=None):
+        # files: only read these files (if they exist)
+        names = self.store.listdir(key(pak, lang, folder))
+        if files is not None:
+            existing = set(names)
+            names = [x for x in files if x in existing]
+        return {x:self.store.read(key(pak, lang, folder, x)) for x in names}
+
+    def sprite_reader(self, pak, lang, folder):
+        # function reading a list of files of a def, for defs read in batches
+        return lambda files: self.sprites(pak, lang, folder, files)
+
+class PakSource:
+    def __init__(self, game_folder):
+        self.data_path = os.path.join(game_folder, "data")
+        self.index_path = None # compiled in memory
+        self.__paks = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        for pak in self.__paks.values():
+            pak.close()
+        self.__paks = {}
+
+    def __pak(self, pak, lang):
+        path = os.path.join(self.data_path, "LOC", lang, pak) if lang else os.path.join(self.data_path, pak)
+        if path not in self.__paks:
+            self.__paks[path] = PakArchive(path) if os.path.isfile(path) else None
+        return self.__paks[path]
+
+    def langs(self, scale):
+        path = os.path.join(self.data_path, "LOC")
+        return sorted(os.listdir(path)) if os.path.isdir(path) else []
+
+    def info(self):
+        # info.csv rows as extract_assets would write them
+        info = []
+        for file, lang in find_paks(self.data_path):
+            archive = self.__pak(os.path.basename(file), lang)
+            for i in range(len(archive)):
+                info += self.__rows(archive, i)
+        return info
+
+    def __rows(self, archive, i):
+        return parse_config(os.path.basename(archive.file), archive.names[i], archive.config(i))
+
+    def __images(self, archive, i, files=None, atlases=None):
+        # files: only crop the rows of these files
+        # atlases: the decoded images of the entry, inflated and decoded here if not given
+        rows = self.__rows(archive, i)
+        if files is not None:
+            files = set(files)
+            rows = [x for x in rows if x.image + ".png" in files or x.image + ".shadow.png" in files]
+        ret = {}
+        for row, img_crop, img_shadow_crop in crop_images(rows, decode_images(archive.read(i)) if atlases is None else atlases):
+            if files is None or row.image + ".png" in files:
+                ret[row.image + ".png"] = img_crop
+            if img_shadow_crop is not None and (files is None or row.image + ".shadow.png" in files):
+                ret[row.image + ".shadow.png"] = img_shadow_crop
+        return ret
+
+    def __files(self, archive, i):
+        files = []
+        for row in self.__rows(archive, i):
+            files.append(row.image + ".png")
+            if row.has_shadow == 1:
+                files.append(row.image + ".shadow.png")
+        return files
+
+    def bitmap_files(self, pak, lang):
+        archive = self.__pak(pak, lang)
+        if archive is None:
+            return []
+        files = []
+        for i in range(len(archive)):
+            files += self.__files(archive, i)
+        return list(dict.fromkeys(files))
+
+    def bitmaps(self, pak, lang, files=None):
+        # files: only decode the entries holding these files
+        archive = self.__pak(pak, lang)
+        if archive is None:
+            return
+        files = None if files is None else set(files)
+        for i in range(len(archive)):
+            if files is None:
+                yield from self.__images(archive, i).items()
+            elif any(row.image + ".png" in files or row.image + ".shadow.png" in files for row in self.__rows(archive, i)):
+                yield from self.__images(archive, i, files).items()
+
+    def sprite_folders(self, pak, lang):
+        archive = self.__pak(pak, lang)
+        if archive is None:
+            return []
+        return [archive.names[i] for i in range(len(archive)) if len(self.__rows(archive, i)) > 0]
+
+    def sprite_files(self, pak, lang, folder):
+        # an entry config can list an image more than once, a folder holds it once
+        archive = self.__pak(pak, lang)
+        return list(dict.fromkeys(self.__files(archive, archive.find(folder))))
+
+    def entries(self, pak, lang):
+        # pak entry -> (directory fingerprint, files), without reading the chunks
+        archive = self.__pak(pak, lang)
+        if archive is None:
+            return {}
+        return {archive.names[i]: (archive.directory_fingerprint(i), self.__files(archive, i)) for i in range(len(archive))}
+
+    def content(self, pak, lang, entry):
+        # fingerprint of the stored chunks of a pak entry or None, reads its whole payload
+        archive = self.__pak(pak, lang)
+        i = None if archive is None else archive.find(entry)
+        return None if i is None else archive.fingerprint(i)
+
+    def sprites(self, pak, lang, folder, files=None):
+        # files: only crop these files
+        archive = self.__pak(pak, lang)
+        return self.__images(archive, archive.find(folder), files)
+
+    def sprite_reader(self, pak, lang, folder):
+        # function cropping a list of files of a def, for defs read in batches. The entry is inflated
+        # and decoded on the first call only, the function keeps the atlases until it is dropped.
+        archive = self.__pak(pak, lang)
+        i = archive.find(folder)
+        atlases = []
+        def read(files):
+            if len(atlases) == 0:
+                atlases.append(decode_images(archive.read(i)))
+            return self.__images(archive, i, files, atlases[0])
+        return read
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2024 Laserlicht
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import io
+import os
+import sys
+import csv
+import json
+import mmap
+import struct
+from array import array
+from collections import namedtuple
+from manifest import ManifestRow, COLUMNS as _INFO_COLUMNS, read_manifest
+
+# Binary index of the sprite metadata used by create_mod:
+#   sd_lod_sprites.csv  - sd sprite layout per def (export from H3 Complete)
+#   info.csv            - hd sprite lines of the paks (written by extract_assets)
+#   spriteFlagsInfo.txt - flag positions of adventure map objects
+#
+# layout: magic, version, section count, section table (name, offset, size), sections.
+# Tables are int32 row major matrices, strings are ids into one interned string table.
+
+MAGIC = b'VCMIHDIX'
+VERSION = 1
+MISSING = -2**31 # empty info.csv/spriteFlagsInfo.txt column
+SPRITES_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sd_lod_sprites.csv") # next to this file, not the working directory
+
+SpriteRow = namedtuple('SpriteRow', 'defname imagename group frame format full_width full_height width height left_margin top_margin')
+
+_HEADER = struct.Struct('<8sII')
+_SECTION = struct.Struct('<16sQQ')
+_SPRITE_COLUMNS = len(SpriteRow._fields)
+_FLAG_COLUMNS = 20
+
+def compile_index(out, sprites_csv, info_csv, flags_txt):
+    # out: path or binary file object. Inputs are paths or text file objects, info_csv can also be info.csv rows.
+    strings = {}
+    def intern(x):
+        if x not in strings:
+            strings[x] = len(strings)
+        return strings[x]
+    def number(x):
+        return int(x) if x != "" else MISSING
+
+    # sprites, grouped by defname (stable, so frame order within a def is kept)
+    with __open_text(sprites_csv) as f:
+        rows = list(csv.reader(f, delimiter=";"))[1:]
+    rows.sort(key=lambda x: x[0])
+    sprites = array('i')
+    defs = array('i')
+    for i, row in enumerate(rows):
+        if len(defs) == 0 or defs[-3] != intern(row[0]):
+            defs.extend([intern(row[0]), i, 0])
+        defs[-1] += 1
+        sprites.extend([intern(row[0]), intern(row[1])] + [number(x) for x in row[2:_SPRITE_COLUMNS]])
+
+    # info.csv rows grouped by entry name (case insensitive), keeping file order within an entry
+    rows = read_manifest(info_csv) if isinstance(info_csv, (str, os.PathLike)) else list(info_csv)
+    rows = sorted(rows, key=lambda x: x.entry.upper())
+    info = array('i')
+    entries = array('i')
+    for i, row in enumerate(rows):
+        if len(entries) == 0 or rows[i - 1].entry.upper() != row.entry.upper():
+            entries.extend([intern(row.entry.upper()), i, 0])
+        entries[-1] += 1
+        info.extend([intern(row.pak), intern(row.entry), intern(row.image)] + [MISSING if x is None else x for x in row[3:]])
+
+    # flags, first line of a name wins
+    flags = array('i')
+    flag_names = set()
+    with __open_text(flags_txt) as f:
+        for line in f:
+            row = line.split()
+            if len(row) == 0 or row[0].upper() in flag_names:
+                continue
+            flag_names.add(row[0].upper())
+            row = row + [""] * (_FLAG_COLUMNS - len(row))
+            flags.extend([intern(row[0])] + [number(x) for x in row[1:_FLAG_COLUMNS]])
+
+    string_data = bytearray()
+    string_offsets = array('i', [0])
+    for x in strings:
+        string_data += x.encode()
+        string_offsets.append(len(string_data))
+
+    stamps = json.dumps([__stamp(x) for x in [sprites_csv, info_csv, flags_txt]]).encode()
+    sections = [
+        (b'stamps', stamps),
+        (b'strings', bytes(string_data)),
+        (b'string_offsets', string_offsets),
+        (b'sprites', sprites),
+        (b'defs', defs),
+        (b'info', info),
+        (b'entries', entries),
+        (b'flags', flags),
+    ]
+    for name, data in sections:
+        if isinstance(data, array) and sys.byteorder != 'little':
+            data.byteswap()
+
+    buf = bytearray(_HEADER.pack(MAGIC, VERSION, len(sections)))
+    table = len(buf)
+    buf += bytes(_SECTION.size * len(sections))
+    for k, (name, data) in enumerate(sections):
+        buf += bytes(-len(buf) % 8) # keep the int32 tables aligned
+        _SECTION.pack_into(buf, table + k * _SECTION.size, name, len(buf), len(memoryview(data).cast('B')))
+        buf += data
+
+    if isinstance(out, (str, os.PathLike)):
+        with open(str(out) + ".tmp", "wb") as f:
+            f.write(buf)
+        os.replace(str(out) + ".tmp", out)
+    else:
+        out.write(buf)
+
+def load_index(index_path, sprites_csv, info_csv, flags_txt):
+    # loads the index at index_path and (re)compiles it first if it is missing or older than its sources.
+    # Without index_path the index is compiled in memory.
+    if index_path is None:
+        buf = io.BytesIO()
+        compile_index(buf, sprites_csv, info_csv, flags_txt)
+        return SpriteIndex(buf.getvalue())
+    if os.path.isfile(index_path):
+        index = SpriteIndex(index_path)
+        if index.stamps == [__stamp(x) for x in [sprites_csv, info_csv, flags_txt]]:
+            return index
+        index.close()
+    compile_index(index_path, sprites_csv, info_csv, flags_txt)
+    return SpriteIndex(index_path)
+
+def __stamp(source):
+    if isinstance(source, (str, os.PathLike)):
+        stat = os.stat(source)
+        return [os.path.abspath(source), stat.st_size, stat.st_mtime_ns]
+    return None
+
+def __open_text(source):
+    if isinstance(source, (str, os.PathLike)):
+        return open(source, newline="")
+    return source
+
+class SpriteIndex:
+    def __init__(self, source):
+        # source: path of an index file (memory mapped) or the index bytes
+        self.__map = None
+        if isinstance(source, (str, os.PathLike)):
+            with open(source, 'rb') as f:
+                self.__map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            source = self.__map
+        view = memoryview(source)
+        magic, version, count = _HEADER.unpack_from(view, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("unsupported sprite index")
+        self.__sections = {}
+        for k in range(count):
+            name, offset, size = _SECTION.unpack_from(view, _HEADER.size + k * _SECTION.size)
+            self.__sections[name.rstrip(b'\0').decode()] = view[offset:offset + size]
+
+        self.stamps = json.loads(bytes(self.__sections['stamps']))
+        self.__strings = self.__sections['strings']
+        self.__string_offsets = self.__table('string_offsets')
+        self.__string_cache = {}
+        self.__sprites = self.__table('sprites')
+        self.__info = self.__table('info')
+        self.__flags = self.__table('flags')
+
+        defs = self.__table('defs')
+        self.__defs = {self.string(defs[k]): (defs[k + 1], defs[k + 2]) for k in range(0, len(defs), 3)}
+        entries = self.__table('entries')
+        self.__entries = {self.string(entries[k]): (entries[k + 1], entries[k + 2]) for k in range(0, len(entries), 3)}
+        self.__flag_rows = {self.string(self.__flags[k]).upper(): k // _FLAG_COLUMNS for k in range(0, len(self.__flags), _FLAG_COLUMNS)}
+
+    def __table(self, name):
+        data = self.__sections[name]
+        if sys.byteorder != 'little':
+            table = array('i')
+            table.frombytes(data)
+            table.byteswap()
+            return table
+        return data.cast('i')
+
+    def close(self):
+        self.__sections = {}
+        self.__strings = self.__string_offsets = self.__sprites = self.__info = self.__flags = None
+        if self.__map is not None:
+            try:
+                self.__map.close()
+            except BufferError:
+                pass
+
+    def string(self, i):
+        if i not in self.__string_cache:
+            self.__string_cache[i] = bytes(self.__strings[self.__string_offsets[i]:self.__string_offsets[i + 1]]).decode()
+        return self.__string_cache[i]
+
+    def defnames(self):
+        # sorted like pandas groupby
+        return list(self.__defs.keys())
+
+    def sprites(self, defname):
+        start, count = self.__defs.get(defname, (0, 0))
+        ret = []
+        for r in range(start, start + count):
+            row = self.__sprites[r * _SPRITE_COLUMNS:(r + 1) * _SPRITE_COLUMNS].tolist()
+            ret.append(SpriteRow(self.string(row[0]), self.string(row[1]), *row[2:]))
+        return ret
+
+    def info(self, entry):
+        # info.csv rows of a pak entry (all paks)
+        start, count = self.__entries.get(entry.upper(), (0, 0))
+        ret = []
+        for r in range(start, start + count):
+            row = self.__info[r * _INFO_COLUMNS:(r + 1) * _INFO_COLUMNS].tolist()
+            ret.append(ManifestRow(*[self.string(x) for x in row[:3]], *[None if x == MISSING else x for x in row[3:]]))
+        return ret
+
+    def flag(self, name):
+        # spriteFlagsInfo.txt row of an image name: name, count, count * (x, y, mirrored)
+        r = self.__flag_rows.get(name.upper())
+        if r is None:
+            return None
+        row = self.__flags[r * _FLAG_COLUMNS:(r + 1) * _FLAG_COLUMNS].tolist()
+        return tuple([self.string(row[0])] + [None if x == MISSING else x for x in row[1:]])
+
+if __name__ == '__main__':
+    # build step: python spriteindex.py <extracted folder>
+    in_folder = sys.argv[1]
+    compile_index(os.path.join(in_folder, "sprites.idx"), SPRITES_CSV, os.path.join(in_folder, "info.csv"), os.path.join(in_folder, "data", "spriteFlagsInfo.txt"))
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2024 Laserlicht
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import os
+import json
+import struct
+
+# Intermediate image store written by extract_assets and read by create_mod. Images are
+# addressed by '/' separated keys: <pak file>/<lang>/<entry>/<image>.png for sprites and
+# <pak file>/<lang>/<image>.png for bitmaps, without the lang part for the com paks.
+#   FolderStore: one file per key below the temporary folder
+#   PackStore:   all keys in one pack file, which avoids the per file overhead of slow or
+#                network file systems and can be copied or cached as a single file
+#   MemoryStore: keys collected in memory, written to the real store by another process
+#
+# pack layout:
+#   records: the data of the keys, appended. A key written again leaves its old data unused
+#            until the pack is compacted.
+#   index:   utf-8 json {key: [offset, size]}
+#   trailer: index offset, index size, magic
+# A pack without a valid trailer (killed process) is read as empty.
+
+PACK_FILE = "images.pack"
+
+_TRAILER = struct.Struct('<2Q4s')
+_MAGIC = b'HDPK'
+
+def key(*parts):
+    return "/".join(x for x in parts if x)
+
+def open_store(folder):
+    # store of an extracted folder, for reading
+    file = os.path.join(folder, PACK_FILE)
+    return PackStore(file) if os.path.isfile(file) else FolderStore(folder)
+
+class FolderStore:
+    def __init__(self, folder):
+        self.folder = folder
+        self.__dirs = set() # folders known to exist
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        pass
+
+    def __path(self, key):
+        return os.path.join(self.folder, *key.split("/"))
+
+    def write(self, key, data):
+        path = self.__path(key)
+        folder = os.path.dirname(path)
+        if folder not in self.__dirs:
+            os.makedirs(folder, exist_ok=True)
+            self.__dirs.add(folder)
+        with open(path, "wb") as f:
+            f.write(data)
+
+    def read(self, key):
+        with open(self.__path(key), "rb") as f:
+            return f.read()
+
+    def size(self, key):
+        # size of the data of a key or None if it is not stored
+        try:
+            return os.path.getsize(self.__path(key))
+        except OSError:
+            return None
+
+    def listdir(self, key):
+        # names one level below a key
+        path = self.__path(key)
+        return os.listdir(path) if os.path.isdir(path) else []
+
+class PackStore:
+    def __init__(self, file, writable=False):
+        self.file = file
+        self.__index = {}
+        self.__end = 0 # end of the records
+        self.__dirs = None # key -> names one level below, built on the first listdir
+        if os.path.isfile(file):
+            self.__f = open(file, "r+b" if writable else "rb")
+            self.__load()
+        else:
+            self.__f = open(file, "w+b") if writable else None
+        self.__writable = writable
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __load(self):
+        f = self.__f
+        f.seek(0, os.SEEK_END)
+        if f.tell() < _TRAILER.size:
+            return
+        f.seek(-_TRAILER.size, os.SEEK_END)
+        offset, size, magic = _TRAILER.unpack(f.read(_TRAILER.size))
+        if magic != _MAGIC or offset + size + _TRAILER.size != f.tell():
+            return
+        f.seek(offset)
+        try:
+            self.__index = {x: tuple(y) for x, y in json.loads(f.read(size)).items()}
+        except ValueError:
+            return
+        self.__end = offset
+
+    def close(self):
+        if self.__f is None:
+            return
+        if self.__writable:
+            # rewrite the pack if more than half of it is unused
+            used = sum(x[1] for x in self.__index.values())
+            if self.__end > 2 * used + (1 << 20):
+                self.__compact()
+            else:
+                self.__f.seek(self.__end)
+                self.__write_index(self.__f)
+                self.__f.truncate()
+        self.__f.close()
+        self.__f = None
+
+    def __write_index(self, f):
+        offset = f.tell()
+        index = json.dumps(self.__index, separators=(",", ":")).encode()
+        f.write(index)
+        f.write(_TRAILER.pack(offset, len(index), _MAGIC))
+
+    def __compact(self):
+        index = {}
+        with open(self.file + ".tmp", "wb") as f:
+            for key, (offset, size) in sorted(self.__index.items(), key=lambda x: x[1][0]):
+                self.__f.seek(offset)
+                index[key] = (f.tell(), size)
+                f.write(self.__f.read(size))
+            self.__index = index
+            self.__end = f.tell()
+            self.__write_index(f)
+        self.__f.close()
+        os.replace(self.file + ".tmp", self.file)
+
+    def write(self, key, data):
+        self.__f.seek(self.__end)
+        self.__f.write(data)
+        self.__index[key] = (self.__end, len(data))
+        self.__end += len(data)
+        self.__dirs = None
+
+    def read(self, key):
+        offset, size = self.__index[key]
+        self.__f.seek(offset)
+        return self.__f.read(size)
+
+    def size(self, key):
+        x = self.__index.get(key)
+        return None if x is None else x[1]
+
+    def listdir(self, key):
+        if self.__dirs is None:
+            self.__dirs = {}
+            for x in self.__index:
+                parts = x.split("/")
+                for i in range(1, len(parts)):
+                    self.__dirs.setdefault("/".join(parts[:i]), {})[parts[i]] = None
+        return list(self.__dirs.get(key, {}))
+
+class MemoryStore:
+    def __init__(self):
+        self.files = {}
+
+    def write(self, key, data):
+        self.files[key] = bytes(data)
+
+    def size(self, key):
+        x = self.files.get(key)
+        return None if x is None else len(x)
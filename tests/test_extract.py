@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2024 Laserlicht
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import os
+import json
+import time
+import threading
+import multiprocessing
+import pytest
+from extract import extract_assets
+from progress import Cancelled
+
+def __files(folder):
+    ret = {}
+    for root, dirs, files in os.walk(folder):
+        for x in files:
+            stat = os.stat(os.path.join(root, x))
+            ret[os.path.join(root, x)] = (stat.st_size, stat.st_mtime_ns)
+    return ret
+
+def test_cancel_with_workers(game, tmp_path):
+    # the workers are stopped before extract_assets returns and the cache matches the files
+    out = str(tmp_path)
+    cancel = threading.Event()
+    def progress(event):
+        if event.done * 2 >= event.total > 0:
+            cancel.set()
+    with pytest.raises(Cancelled):
+        extract_assets(game, out, workers=3, progress=progress, cancel=cancel)
+    assert multiprocessing.active_children() == []
+    files = __files(out)
+    time.sleep(1)
+    assert __files(out) == files
+
+    with open(os.path.join(out, "extract_cache.json")) as f:
+        entries = json.load(f)["entries"]
+    for record in entries.values():
+        for file, size in record["outputs"].items():
+            assert os.path.getsize(os.path.join(out, *file.split("/"))) == size
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2024 Laserlicht
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import numpy as np
+import pytest
+from pak import PakArchive
+from synth import write_pak, dds
+
+def __images():
+    rng = np.random.default_rng(1)
+    return [dds(rng.integers(0, 256, (x, 32, 4), np.uint8)) for x in [64, 16, 48]]
+
+@pytest.mark.parametrize("compress,raw_chunk", [(True, None), (False, None), (False, 100), (False, 1000)])
+def test_read_images(tmp_path, compress, raw_chunk):
+    # one image per compressed chunk, per raw chunk or split into several raw chunks
+    images = __images()
+    file = str(tmp_path / "bitmap_test.pak")
+    write_pak(file, [("entry", b"", images)], compress=compress, raw_chunk=raw_chunk)
+    with PakArchive(file) as archive:
+        assert [bytes(x) for x in archive.read(0)] == images
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2024 Laserlicht
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import os
+from pak import PakArchive
+from selection import Selection
+from extract import extract_assets, extracted_entries
+from instrument import Stats
+
+def test_bitmap_name_selects_its_entry(game):
+    with PakArchive(os.path.join(game, "data", "bitmap_DXT_com_x2.pak")) as archive:
+        assert [archive.names[i] for i in Selection(["bitmap00"]).indices(archive)] == ["bitmaps"]
+        assert Selection(["bitmap_DXT_com_x2.pak/Bitmap0?"]).indices(archive) == [0]
+        assert Selection(["Bitmap99"]).indices(archive) == []
+    with PakArchive(os.path.join(game, "data", "sprite_DXT_com_x2.pak")) as archive:
+        assert Selection(["Bitmap00"]).indices(archive) == []
+
+def test_extract_bitmap_pattern(game, tmp_path):
+    # the same pattern extracts the bitmap that create_mod rebuilds
+    stats = Stats()
+    extract_assets(game, str(tmp_path), select=Selection(["Bitmap00"]), stats=stats)
+    entries = extracted_entries(str(tmp_path))
+    assert sorted(entries) == ["bitmap_DXT_com_x%s.pak//bitmaps" % x for x in "23"] + ["bitmap_DXT_loc_x%s.pak/EN/locbmps" % x for x in "23"]
+    assert stats.counters["entries"] == 4
+    for x in ["2", "3"]:
+        assert os.path.isfile(os.path.join(str(tmp_path), "bitmap_DXT_com_x%s.pak" % x, "Bitmap00.png"))
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2024 Laserlicht
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import os
+import json
+import zipfile
+from collections import namedtuple
+from source import PakSource
+from spriteindex import SPRITES_CSV, load_index
+from create_mod import list_mods, source_groups, frame_name
+from fingerprints import FILE, load_fingerprints
+
+# Checks built mods against the game paks without rebuilding them: the expected archive members,
+# the frame lists of the animation configs and the fingerprints in fingerprints.json. Only the
+# pak directories and configs, the zip directories and the animation configs are read.
+Problem = namedtuple('Problem', [
+    'mod',      # mod folder, e.g. x2_translation_en
+    'kind',     # missing, extra, stale, unverified or config
+    'name',     # archive member or source group (<pak file>/<entry>)
+    'detail'
+])
+
+def verify_mod(game_folder, out_folder, scales, langs=None):
+    # returns the problems found, none if the mods are up to date with the paks
+    problems = []
+    with PakSource(game_folder) as source:
+        index = load_index(source.index_path, SPRITES_CSV, source.info(), os.path.join(source.data_path, "spriteFlagsInfo.txt"))
+        plans = {}
+        for scale in scales:
+            for mod, pak, lang in list_mods(source, scale, langs):
+                bitmaps, defs = source_groups(source, index, scale, pak, lang, plans)
+                problems += __verify(os.path.join(out_folder, "hd_version", "mods", mod), mod, scale, bitmaps, defs)
+    return problems
+
+def __verify(destination, mod, scale, bitmaps, defs):
+    content = os.path.join(destination, "content.zip")
+    if not os.path.isfile(content):
+        return [Problem(mod, "missing", "content.zip", "mod not built")]
+    problems = []
+    stored = load_fingerprints(destination)
+    if stored is None:
+        problems.append(Problem(mod, "unverified", FILE, "no fingerprints, only the members are checked"))
+    groups = stored[1] if stored is not None else {}
+
+    with zipfile.ZipFile(content) as archive:
+        names = set(archive.namelist())
+        expected = set()
+        for name, fingerprint, files in bitmaps:
+            members = ["data" + scale + "x/" + os.path.splitext(x)[0] + ".png" for x in files]
+            problems += __check_group(mod, name, fingerprint, groups.get(name), members, names, stored is not None)
+            expected.update(members)
+        for name, fingerprint, plan in defs:
+            config = "sprites" + scale + "x/" + plan.folder + ".json"
+            if config not in names:
+                problems.append(Problem(mod, "missing", config, "animation config"))
+                continue
+            members = [config] + __def_members(mod, archive, config, scale, plan, names, problems)
+            problems += __check_group(mod, name, fingerprint, groups.get(name), members, names, stored is not None)
+            expected.update(members)
+        problems += [Problem(mod, "extra", x, "no pak entry or def") for x in sorted(names - expected)]
+    return problems
+
+def __def_members(mod, archive, config, scale, plan, names, problems):
+    # members expected for a def: its files, except the ones of frames the config points to
+    # another (identical) frame for. With a wrong config the files in the archive are taken.
+    members = ["sprites" + scale + "x/" + plan.folder + "/" + x.replace(".shadow", "-shadow") for x in plan.files]
+    images = json.loads(archive.read(config))["images"]
+    if [(x["group"], x["frame"]) for x in images] != [(x.group, x.frame) for x in plan.animation]:
+        problems.append(Problem(mod, "config", config, "frame list differs from the sprite index"))
+        return [x for x in members if x in names]
+    aliases = {x.imagename.upper(): os.path.splitext(y["file"])[0].upper() for x, y in zip(plan.animation, images)}
+    ret = []
+    for file, member in zip(plan.files, members):
+        name = frame_name(file).upper()
+        if aliases.get(name, name) == name:
+            ret.append(member)
+    return ret
+
+def __check_group(mod, name, fingerprint, stored, members, names, fingerprinted):
+    problems = [Problem(mod, "missing", x, name) for x in members if x not in names]
+    if not fingerprinted:
+        return problems
+    if stored is None or stored["fingerprint"] is None or fingerprint is None:
+        problems.append(Problem(mod, "unverified", name, "no fingerprint"))
+    elif stored["fingerprint"] != fingerprint:
+        problems.append(Problem(mod, "stale", name, "pak entry or sprite index changed"))
+    return problems
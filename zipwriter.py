@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2024 Laserlicht
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import os
+import zlib
+import queue
+import struct
+import zipfile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# content.zip writer of create_mod. Members are encoded (png, crc32 and deflate) on a thread
+# pool and written by a single writer thread in the order they were added, so the archive
+# is the same for any number of threads. The archive is written to <file>.tmp and replaces
+# the file on close, an archive left by an exception is discarded.
+
+_LOCAL = struct.Struct('<4s5H3I2H')
+_CENTRAL = struct.Struct('<4s6H3I5H2I')
+_END = struct.Struct('<4s4H2IH')
+_END64 = struct.Struct('<4sQ2H2I4Q')
+_LOCATOR64 = struct.Struct('<4sIQI')
+_LIMIT = 0xFFFFFFFF
+_TIME, _DATE = 0, (1 << 5) | 1 # 1980-01-01, fixed for reproducible archives
+
+class Aborted(Exception):
+    pass
+
+class ZipWriter:
+    def __init__(self, file, compression=zipfile.ZIP_STORED, compresslevel=None, threads=None, pending=256, memory=None):
+        # pending: members that may be queued before writestr blocks
+        # memory: bytes of queued members (as estimated by the caller) before writestr blocks
+        if compression not in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+            raise NotImplementedError("compression method not supported")
+        self.file = file
+        self.__compression = compression
+        self.__level = -1 if compresslevel is None else compresslevel
+        self.__f = open(file + '.tmp', 'wb', buffering=1 << 20)
+        self.__offset = 0
+        self.__members = [] # (name, flags, crc, compressed size, size, offset) for the central directory
+        self.__error = None
+        self.__executor = ThreadPoolExecutor(max_workers=threads)
+        self.__queue = queue.Queue(pending)
+        self.__memory = memory
+        self.__queued = 0 # estimated bytes of the queued members
+        self.__done = threading.Condition()
+        self.__writer = threading.Thread(target=self.__write_members, daemon=True)
+        self.__writer.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def writestr(self, name, data, size=0):
+        # data: bytes, str (utf-8 encoded like zipfile) or a function returning them, which is
+        # called on a worker thread
+        # size: estimated memory held by the member until it is written, e.g. of the image
+        #       data will encode
+        if self.__error is not None:
+            raise self.__error
+        self.__reserve(size)
+        self.__queue.put((name, self.__executor.submit(self.__encode, data), size))
+
+    def __reserve(self, size):
+        # waits until the member fits into the memory budget, a member is always allowed when
+        # nothing is queued
+        if self.__memory is None or size == 0:
+            return
+        with self.__done:
+            while self.__queued > 0 and self.__queued + size > self.__memory and self.__error is None:
+                self.__done.wait()
+            self.__queued += size
+
+    def __release(self, size):
+        if size == 0:
+            return
+        with self.__done:
+            self.__queued -= size
+            self.__done.notify_all()
+
+    def copy(self, archive, name):
+        # copies a member of an open zipfile.ZipFile. Members with the compression of this archive
+        # are copied as they are, without decompressing them.
+        if self.__error is not None:
+            raise self.__error
+        info = archive.getinfo(name)
+        if info.compress_type != self.__compression:
+            return self.writestr(name, archive.read(name))
+        archive.fp.seek(info.header_offset)
+        header = _LOCAL.unpack(archive.fp.read(_LOCAL.size))
+        archive.fp.seek(header[-2] + header[-1], os.SEEK_CUR) # name and extra field
+        future = Future()
+        future.set_result((archive.fp.read(info.compress_size), info.CRC, info.file_size))
+        self.__queue.put((name, future, 0))
+
+    def close(self):
+        if self.__f.closed:
+            return
+        self.__queue.put(None)
+        self.__writer.join()
+        self.__executor.shutdown()
+        try:
+            if self.__error is None:
+                self.__write_directory()
+        finally:
+            self.__f.close()
+        if self.__error is not None:
+            os.remove(self.file + '.tmp')
+            raise self.__error
+        os.replace(self.file + '.tmp', self.file)
+
+    def abort(self):
+        # stops the encoding and removes the partial archive, the old file stays in place
+        if self.__f.closed:
+            return
+        self.__error = self.__error or Aborted()
+        self.__executor.shutdown(wait=False, cancel_futures=True)
+        self.__queue.put(None)
+        self.__writer.join()
+        self.__executor.shutdown()
+        self.__f.close()
+        os.remove(self.file + '.tmp')
+
+    def __encode(self, data):
+        if callable(data):
+            data = data()
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        crc, size = zlib.crc32(data), len(data)
+        if self.__compression == zipfile.ZIP_DEFLATED:
+            compressor = zlib.compressobj(self.__level, zlib.DEFLATED, -15)
+            data = compressor.compress(data) + compressor.flush()
+        return data, crc, size
+
+    def __write_members(self):
+        while True:
+            item = self.__queue.get()
+            if item is None:
+                return
+            name, future, size = item
+            try:
+                if self.__error is None: # otherwise the queue is drained so writestr does not block
+                    self.__write_member(name, *future.result())
+            except BaseException as e:
+                self.__error = e
+            finally:
+                self.__release(size)
+
+    def __write_member(self, name, data, crc, size):
+        try:
+            name, flags = name.encode('ascii'), 0
+        except UnicodeEncodeError:
+            name, flags = name.encode('utf-8'), 0x800
+        extra = b''
+        csize, local_csize, local_size = len(data), len(data), size
+        if csize >= _LIMIT or size >= _LIMIT:
+            extra = struct.pack('<2H2Q', 1, 16, size, csize)
+            local_csize, local_size = _LIMIT, _LIMIT
+        version = 45 if extra or self.__offset >= _LIMIT else 20
+        self.__f.write(_LOCAL.pack(b'PK\x03\x04', version, flags, self.__compression, _TIME, _DATE, crc, local_csize, local_size, len(name), len(extra)))
+        self.__f.write(name)
+        self.__f.write(extra)
+        self.__f.write(data)
+        self.__members.append((name, flags, crc, csize, size, self.__offset))
+        self.__offset += _LOCAL.size + len(name) + len(extra) + csize
+
+    def __write_directory(self):
+        start = self.__offset
+        for name, flags, crc, csize, size, offset in self.__members:
+            # zip64 extra field holds the values that do not fit, in this order
+            extra = [x for x in (size, csize, offset) if x >= _LIMIT]
+            extra = struct.pack('<2H%dQ' % len(extra), 1, 8 * len(extra), *extra) if extra else b''
+            version = 45 if extra else 20
+            self.__f.write(_CENTRAL.pack(b'PK\x01\x02', version, version, flags, self.__compression, _TIME, _DATE, crc,
+                                         min(csize, _LIMIT), min(size, _LIMIT), len(name), len(extra), 0, 0, 0, 0o600 << 16, min(offset, _LIMIT)))
+            self.__f.write(name)
+            self.__f.write(extra)
+            self.__offset += _CENTRAL.size + len(name) + len(extra)
+        count, size = len(self.__members), self.__offset - start
+        if count > 0xFFFF or size >= _LIMIT or start >= _LIMIT:
+            self.__f.write(_END64.pack(b'PK\x06\x06', _END64.size - 12, 45, 45, 0, 0, count, count, size, start))
+            self.__f.write(_LOCATOR64.pack(b'PK\x06\x07', 0, self.__offset, 1))
+        self.__f.write(_END.pack(b'PK\x05\x06', 0, 0, min(count, 0xFFFF), min(count, 0xFFFF), min(size, _LIMIT), min(start, _LIMIT), 0))